@@ -1,5 +1,4 @@
 import math
-import matplotlib.pyplot as plt
 from dataclasses import dataclass
 
 @dataclass
@@ -209,6 +208,9 @@ def generate_gridfinity_baseplate_plan(M, N, a, b, K=42, min_margin_cells=1):
     return info, pieces
 
 def plot_plan(info, pieces, show_grid=True, save_path=None):
+    # 只有出图需要 matplotlib，规划和合并可以在没有它的环境里运行（测试、基准）
+    import matplotlib.pyplot as plt
+
     M, N, K = info["M"], info["N"], info["K"]
     mx, my = info["margin_left"], info["margin_bottom"]
     used_x, used_y = info["used_x"], info["used_y"]
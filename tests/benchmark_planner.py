@@ -0,0 +1,111 @@
+"""
+Micro-benchmarks for the drawer baseplate planners.
+
+Times webapp/planner.py (make_plan, optimize_plan, plan_table rows) and
+scripts/baseplate_tools.py (generate_gridfinity_baseplate_plan + merge_pieces)
+from small drawers up to 3000 mm and from 1-cell to 71-cell printers, and checks
+every plan with planner.verify_tiling.
+
+    python tests/benchmark_planner.py
+    python tests/benchmark_planner.py --output planner.json
+    python tests/benchmark_planner.py --output new.json --compare planner.json --threshold 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import baseplate_tools
+import planner
+
+GRID = 42.0
+DRAWERS = (300.0, 1000.0, 2000.0, 3000.0)
+PRINTER_CELLS = (1, 2, 6, 71)
+
+
+def timed(function, repeat: int) -> tuple[float, object]:
+    """Median seconds of ``repeat`` calls and the last result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def script_plan(size: float, printer: float) -> list[dict]:
+    info, pieces = baseplate_tools.generate_gridfinity_baseplate_plan(size, size, printer, printer, K=GRID)
+    return [asdict(piece) for piece in baseplate_tools.merge_pieces(pieces, info["a"], info["b"])]
+
+
+def cases():
+    """Yield ``(name, plan function, verify function)``; verify maps a result to its problems."""
+    for size, cells in itertools.product(DRAWERS, PRINTER_CELLS):
+        printer = cells * GRID
+        yield (f"make_plan-{size:g}-{cells}",
+               lambda size=size, printer=printer: planner.make_plan(size, size, printer, printer, GRID, 1),
+               planner.verify_plan)
+        yield (f"optimize_plan-{size:g}-{cells}",
+               lambda size=size, printer=printer: planner.optimize_plan(size, size, printer, printer, GRID, 1, 3),
+               planner.verify_plan)
+        yield (f"baseplate_tools-{size:g}-{cells}",
+               lambda size=size, printer=printer: script_plan(size, printer),
+               lambda pieces, size=size, printer=printer: planner.verify_tiling(pieces, size, size, printer, printer))
+    # One vectorised call over the whole input range (59 x 59 drawers x 71 x 2 printers).
+    sizes = np.arange(100.0, 3001.0, 50.0)
+    yield ("plan_table-494k-rows",
+           lambda: planner.plan_table(sizes, sizes, np.arange(1, 72), (1, 71), 1, GRID),
+           None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="calls per case; the median counts (default: 5)")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed slowdown ratio (default: 0.3)")
+    args = parser.parse_args()
+
+    results = []
+    for name, function, verify in cases():
+        try:
+            seconds, result = timed(function, max(1, args.repeat))
+        except ValueError as exc:
+            print(f"{name:32s} skipped: {exc}")
+            continue
+        verify_seconds, problems = timed(lambda: verify(result), 1) if verify else (0.0, [])
+        pieces = len(result["pieces"] if isinstance(result, dict) and "pieces" in result else result) if verify else 0
+        results.append({"name": name, "seconds": seconds, "pieces": pieces,
+                        "verify_seconds": verify_seconds, "problems": problems[:5]})
+        status = "ok" if not problems else f"INVALID: {problems[0]}"
+        print(f"{name:32s} {seconds * 1000:9.2f} ms {pieces:6d} pieces  verify {verify_seconds * 1000:7.2f} ms  {status}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"created": time.time(), "results": results}, indent=2), encoding="utf-8")
+    if args.compare:
+        baseline = {item["name"]: item for item in json.loads(args.compare.read_text(encoding="utf-8"))["results"]}
+        regressions = [
+            f"{item['name']}: {baseline[item['name']]['seconds'] * 1000:.2f} ms -> {item['seconds'] * 1000:.2f} ms"
+            for item in results
+            if item["name"] in baseline and item["seconds"] > baseline[item["name"]]["seconds"] * (1 + args.threshold)
+        ]
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
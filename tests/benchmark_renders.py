@@ -0,0 +1,198 @@
+"""
+Render benchmark for the web generators across OpenSCAD backends.
+
+Renders a fixed matrix of baseplate pieces, bins, pins and lids with exactly the
+SCAD code and -D values the web service uses, once per available backend.
+
+    python tests/benchmark_renders.py --output bench.json
+    python tests/benchmark_renders.py --output new.json --compare bench.json --threshold 0.15
+    python tests/benchmark_renders.py --only bin --repeat 3
+
+With --compare, cases slower than the baseline by more than --threshold (or
+that newly fail) are listed and the exit status is 1.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from openscad_runner import OpenScadRunner, set_variable_argument
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+
+def piece_cases(web) -> list[tuple[str, str, dict]]:
+    pieces = [
+        {"w": 42.0, "h": 42.0, "kind": "center"},
+        {"w": 126.0, "h": 126.0, "kind": "center"},
+        {"w": 210.0, "h": 210.0, "kind": "center"},
+        {"w": 100.0, "h": 87.0, "kind": "corner_lb"},
+        {"w": 16.0, "h": 168.0, "kind": "edge_left"},
+    ]
+    return [
+        (f"piece-{piece['kind']}-{piece['w']:g}x{piece['h']:g}-style{style}",
+         web.scad_code(piece, 42.0, style, True), {})
+        for piece in pieces for style in (0, 4)
+    ]
+
+
+def bin_cases(web) -> list[tuple[str, str, dict]]:
+    matrix = [
+        {"gridx": 1, "gridy": 1, "divx": 1, "divy": 1},
+        {"gridx": 2, "gridy": 1, "divx": 2, "divy": 1},
+        {"gridx": 3, "gridy": 3, "divx": 3, "divy": 3},
+        {"gridx": 4, "gridy": 4, "divx": 8, "divy": 8},
+        {"gridx": 2, "gridy": 2, "divx": 2, "divy": 2, "cut_mode": "circles", "cylinder_diameter": 15},
+        {"gridx": 2, "gridy": 2, "divx": 2, "divy": 2, "cut_mode": "rectangles"},
+        {"gridx": 2, "gridy": 2, "divx": 2, "divy": 2, "hole_style": 1},
+        {"gridx": 2, "gridy": 2, "divx": 2, "divy": 2, "hole_style": 2},
+        {"gridx": 3, "gridy": 2, "divx": 3, "divy": 2, "include_lip": False},
+    ]
+    cases = []
+    for body in matrix:
+        params = web.parse_bin_payload(body)
+        name = "bin-" + "-".join(f"{key}{value}" for key, value in body.items())
+        # Like render_bin: the base and lip wall parts first, then the assembly that imports
+        # them. Cases run in order and the assembly is written next to the part STLs.
+        parts = {"base": Path(f"{name}-base.stl")}
+        cases.append((f"{name}-base", web.bin_part_code(params, "base"), {}))
+        if params["include_lip"]:
+            parts["wall"] = Path(f"{name}-wall.stl")
+            cases.append((f"{name}-wall", web.bin_part_code(params, "wall"), {"d_wall": params["wall_thickness"]}))
+        defines = {"d_wall": params["wall_thickness"], "d_div": params["divider_thickness"]}
+        cases.append((name, web.bin_scad_code(params, parts=parts), defines))
+    return cases
+
+
+def pin_cases(web) -> list[tuple[str, Path, dict]]:
+    bodies = [{}, {"head_diameter": 4.0, "head_length": 8.0}, {"pointed_head": False}]
+    return [(f"pin-{index}", web.PIN_SCAD_PATH, web.parse_pin_payload(body)) for index, body in enumerate(bodies)]
+
+
+def lid_cases(web) -> list[tuple[str, Path, dict]]:
+    cases = []
+    for style in ("default", "flat", "halfpitch", "efficient"):
+        for grid in ((1, 1), (3, 2)):
+            params = web.parse_lid_payload({"gridx": grid[0], "gridy": grid[1], "lid_style": style})
+            cases.append((f"lid-{style}-{grid[0]}x{grid[1]}", web.LID_SCAD_PATH, web.lid_defines(params)))
+    return cases
+
+
+GENERATORS = {"piece": piece_cases, "bin": bin_cases, "pin": pin_cases, "lid": lid_cases}
+
+
+def openscad_help(openscad: str) -> str:
+    run = subprocess.run([openscad, "--help"], capture_output=True, text=True)
+    return run.stdout + run.stderr
+
+
+def available_backends(help_text: str) -> list[str]:
+    """Backend names listed by `openscad --help`, or [""] if it has no --backend option."""
+    for line in help_text.splitlines():
+        if "--backend" in line:
+            return re.findall(r"'(\w+)'", line) or [""]
+    return [""]
+
+
+def openscad_version(openscad: str) -> str:
+    run = subprocess.run([openscad, "--version"], capture_output=True, text=True)
+    return (run.stdout + run.stderr).strip()
+
+
+def run_case(runner: OpenScadRunner, defines: dict, backend: str, output: Path, repeat: int,
+             scad_define, export_args: list[str]) -> dict:
+    args = ([f"--backend={backend}"] if backend else []) + export_args
+    for name, value in defines.items():
+        args += set_variable_argument(name, scad_define(value))
+    timings = []
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            runner.export_model(args, output)
+            timings.append(round(time.perf_counter() - started, 3))
+    except subprocess.CalledProcessError as exc:
+        return {"ok": False, "error": exc.stderr.decode(errors="replace")[-500:], "runs": timings}
+    return {"ok": True, "seconds": min(timings), "runs": timings, "bytes": output.stat().st_size}
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    previous = {(item["name"], item["backend"]): item for item in baseline["results"]}
+    regressions = []
+    for item in results:
+        before = previous.get((item["name"], item["backend"]))
+        if before is None or not before["ok"]:
+            continue
+        label = f"{item['name']} [{item['backend'] or 'default'}]"
+        if not item["ok"]:
+            regressions.append(f"{label}: now fails")
+        elif item["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append(f"{label}: {before['seconds']:.2f}s -> {item['seconds']:.2f}s "
+                               f"(+{(item['seconds'] / before['seconds'] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--openscad", default=os.environ.get("OPENSCAD_BIN") or shutil.which("openscad") or "openscad")
+    parser.add_argument("--output", type=Path, required=True, help="where to write the JSON results")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio (default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest counts (default: 1)")
+    parser.add_argument("--only", default=",".join(GENERATORS), help="comma separated generators to run")
+    parser.add_argument("--backends", help="comma separated backends (default: all listed by --help)")
+    args = parser.parse_args()
+
+    # The generated code includes the library relative to the checkout, like the web service.
+    os.environ["OPENSCADPATH"] = os.pathsep.join(filter(None, [str(ROOT), os.environ.get("OPENSCADPATH")]))
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with TemporaryDirectory(prefix="gridfinity-bench-") as temp:
+        # Keep the web module from touching the real cache while it is imported.
+        os.environ["GRIDFINITY_CACHE_DIR"] = str(Path(temp) / "cache")
+        import app as web
+        from openscad import scad_define
+
+        help_text = openscad_help(args.openscad)
+        backends = args.backends.split(",") if args.backends else available_backends(help_text)
+        # Same output format as render_stl, so export time is comparable.
+        export_args = ["--export-format", "binstl"] if "binstl" in help_text else []
+        results = []
+        for generator in args.only.split(","):
+            for name, source, defines in GENERATORS[generator](web):
+                if isinstance(source, Path):
+                    scad_path = source
+                    if not scad_path.exists():
+                        print(f"skip {name}: {scad_path} not found", flush=True)
+                        continue
+                else:
+                    scad_path = Path(temp) / f"{name}.scad"
+                    scad_path.write_text(source, encoding="utf-8")
+                runner = OpenScadRunner(scad_path)
+                runner.openscad_binary_path = args.openscad
+                for backend in backends:
+                    result = run_case(runner, defines, backend, Path(temp) / f"{name}.stl", max(1, args.repeat),
+                                      scad_define, export_args)
+                    results.append({"name": name, "generator": generator, "backend": backend, **result})
+                    timing = f"{result['seconds']:.2f}s" if result["ok"] else "FAILED"
+                    print(f"{name:55s} {backend or 'default':9s} {timing}", flush=True)
+
+    report = {"openscad": openscad_version(args.openscad), "created": time.time(), "results": results}
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -142,6 +142,17 @@ class OpenScadRunner:
             ["-o", str(image_path), str(self.scad_file_path)]
         #print(command_arguments)
 
+        return self._run_with_parameters(command_arguments)
+
+    def export_model(self, args: [str], output_path: Path) -> subprocess.CompletedProcess:
+        """
+        Run the code and export a model (format from the file extension, e.g. `.stl`).
+        Unlike `create_image`, no image or `$fa`/`$fs` arguments are added, so the file's own resolution is used.
+        """
+        assert(self.scad_file_path.exists())
+        return self._run_with_parameters(args + ["-o", str(output_path), str(self.scad_file_path)])
+
+    def _run_with_parameters(self, command_arguments: [str]) -> subprocess.CompletedProcess:
         if self.parameters != None:
             #print(self.parameters)
             params = ParameterFile(parameterSets={"python_generated": self.parameters})
@@ -0,0 +1,43 @@
+"""
+Tests for the JSON-lines action log (webapp/action_log.py).
+"""
+from __future__ import annotations
+
+import json
+import sys
+import threading
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+from action_log import ActionLog
+
+
+def test_rotation_by_size_keeps_every_record(tmp_path):
+    path = tmp_path / "action.log"
+    # Two writers on one file, like two worker processes.
+    logs = [ActionLog(path, ZoneInfo("Asia/Shanghai"), max_bytes=4000, backups=1000, rotate_seconds=0,
+                      flush_seconds=0.01, batch_size=7) for _ in range(2)]
+
+    def record(log: ActionLog, writer: int) -> None:
+        for index in range(300):
+            log.record("生成单块底板 STL", ip="127.0.0.1", status=200, details={"writer": writer, "index": index})
+
+    threads = [threading.Thread(target=record, args=(log, writer)) for writer, log in enumerate(logs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for log in logs:
+        log.close()
+
+    rotated = logs[0].rotated()
+    assert rotated
+    files = [*rotated, path]
+    assert all(file.stat().st_size <= 4000 for file in files)
+    entries = [json.loads(line) for file in files for line in file.read_text(encoding="utf-8").splitlines()]
+    assert sorted((entry["details"]["writer"], entry["details"]["index"]) for entry in entries) == [
+        (writer, index) for writer in range(2) for index in range(300)
+    ]
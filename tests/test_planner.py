@@ -0,0 +1,171 @@
+"""
+Tests for the drawer baseplate planners (webapp/planner.py and scripts/baseplate_tools.py).
+
+Every plan is checked with planner.verify_tiling: pieces inside the drawer, no
+overlaps, no gaps and nothing larger than the printer bed. The property-based
+tests need hypothesis and are skipped without it.
+"""
+from __future__ import annotations
+
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import baseplate_tools
+import planner
+
+GRID = 42.0
+
+
+def script_plan(width: float, depth: float, printer_x: float, printer_y: float, margin_cells: int) -> list[dict]:
+    info, pieces = baseplate_tools.generate_gridfinity_baseplate_plan(
+        width, depth, printer_x, printer_y, K=GRID, min_margin_cells=margin_cells,
+    )
+    return [asdict(piece) for piece in baseplate_tools.merge_pieces(pieces, info["a"], info["b"])]
+
+
+@pytest.mark.parametrize("width, depth, printer_x, printer_y, margin_cells", [
+    (413, 408, 252, 252, 1),
+    (300, 200, 252, 252, 0),
+    (1008, 620, 42, 84, 1),
+    (2982, 2982, 42, 42, 1),
+    (3000, 1500, 2982, 2982, 2),
+])
+def test_make_plan_tiles_drawer(width, depth, printer_x, printer_y, margin_cells):
+    for split in planner.CENTER_SPLITS:
+        plan = planner.make_plan(width, depth, printer_x, printer_y, GRID, margin_cells, split)
+        assert planner.verify_plan(plan) == []
+
+
+def test_optimize_plan_tiles_drawer():
+    plan = planner.optimize_plan(1000, 620, 84, 210, GRID, 1, 3)
+    assert planner.verify_plan(plan) == []
+
+
+def test_script_plan_tiles_drawer():
+    assert planner.verify_tiling(script_plan(413, 408, 252, 252, 2), 413, 408, 252, 252) == []
+
+
+def test_verify_tiling_reports_problems():
+    plan = planner.make_plan(413, 408, 252, 252)
+    pieces = plan["pieces"]
+
+    shifted = [dict(pieces[0], x=pieces[0]["x"] + 5), *pieces[1:]]
+    assert any("overlaps" in problem for problem in planner.verify_tiling(shifted, 413, 408, 252, 252))
+
+    missing = pieces[1:]
+    assert any("cover" in problem for problem in planner.verify_tiling(missing, 413, 408, 252, 252))
+
+    outside = [dict(pieces[0], x=-10), *pieces[1:]]
+    assert any("leaves the drawer" in problem for problem in planner.verify_tiling(outside, 413, 408, 252, 252))
+
+    assert any("printer bed" in problem for problem in planner.verify_tiling(pieces, 413, 408, 100, 100))
+
+
+def test_verify_tiling_accepts_rotated_pieces():
+    pieces = [{"pid": 1, "x": 0, "y": 0, "w": 84, "h": 42}, {"pid": 2, "x": 0, "y": 42, "w": 84, "h": 42}]
+    assert planner.verify_tiling(pieces, 84, 84, 42, 84) == []
+
+
+def test_plan_table_matches_make_plan():
+    widths = [30.0, 41.9, 126.0, 130.5, 213.0, 413.0, 500.7, 1008.0, 1700.3]
+    depths = [42.0, 88.0, 300.0, 408.0, 1234.5]
+    table = planner.plan_table(widths, depths, [1, 2, 3, 5, 8], [1, 4, 6], [0, 1, 2, 3])
+    columns = table["columns"]
+    assert len(table["rows"]) == 9 * 5 * 5 * 3 * 4
+    for row in table["rows"]:
+        row = dict(zip(columns, row))
+        printer_x, printer_y = row["printer_x_cells"] * GRID, row["printer_y_cells"] * GRID
+        try:
+            plan = planner.make_plan(row["width"], row["depth"], printer_x, printer_y, GRID, row["min_margin_cells"])
+        except ValueError as exc:
+            assert row["error"] == str(exc)
+            continue
+        assert row["error"] is None
+        gx, gy = plan["grid_count"]["x"], plan["grid_count"]["y"]
+        margin_x, margin_y = plan["margins"]["left"], plan["margins"]["top"]
+        x_center = planner._segments(gx, row["printer_x_cells"])
+        y_center = planner._segments(gy, row["printer_y_cells"])
+        expected = {
+            "grid_x": gx, "grid_y": gy, "margin_x": pytest.approx(margin_x), "margin_y": pytest.approx(margin_y),
+            "center_x_segments": len(x_center), "center_y_segments": len(y_center),
+            "center_x_cells_max": max(x_center), "center_x_cells_min": min(x_center),
+            "center_y_cells_max": max(y_center), "center_y_cells_min": min(y_center),
+            "edge_x_segments": len(planner._pack([margin_x] + [GRID] * gx + [margin_x], printer_x)),
+            "edge_y_segments": len(planner._pack([margin_y] + [GRID] * gy + [margin_y], printer_y)),
+            "piece_count": plan["piece_count"],
+        }
+        assert {key: row[key] for key in expected} == expected, row
+
+
+def test_make_plan_fuzz():
+    hypothesis = pytest.importorskip("hypothesis")
+    strategies = hypothesis.strategies
+
+    @hypothesis.settings(max_examples=300, deadline=None)
+    @hypothesis.given(
+        width=strategies.floats(1, 3000), depth=strategies.floats(1, 3000),
+        printer_x_cells=strategies.integers(1, 71), printer_y_cells=strategies.integers(1, 71),
+        margin_cells=strategies.integers(0, 3), split=strategies.sampled_from(planner.CENTER_SPLITS),
+    )
+    def check(width, depth, printer_x_cells, printer_y_cells, margin_cells, split):
+        try:
+            plan = planner.make_plan(width, depth, printer_x_cells * GRID, printer_y_cells * GRID,
+                                     GRID, margin_cells, split)
+        except ValueError:
+            return
+        assert planner.verify_plan(plan) == []
+
+    check()
+
+
+def test_optimize_plan_fuzz():
+    hypothesis = pytest.importorskip("hypothesis")
+    strategies = hypothesis.strategies
+
+    @hypothesis.settings(max_examples=100, deadline=None)
+    @hypothesis.given(
+        width=strategies.floats(1, 3000), depth=strategies.floats(1, 3000),
+        printer_x_cells=strategies.integers(1, 71), printer_y_cells=strategies.integers(1, 71),
+        margin_cells=strategies.integers(0, 2), extra_margin_cells=strategies.integers(0, 2),
+    )
+    def check(width, depth, printer_x_cells, printer_y_cells, margin_cells, extra_margin_cells):
+        try:
+            plan = planner.optimize_plan(width, depth, printer_x_cells * GRID, printer_y_cells * GRID,
+                                         GRID, margin_cells, margin_cells + extra_margin_cells)
+        except ValueError:
+            return
+        assert planner.verify_plan(plan) == []
+
+    check()
+
+
+def test_script_plan_fuzz():
+    hypothesis = pytest.importorskip("hypothesis")
+    strategies = hypothesis.strategies
+
+    @hypothesis.settings(max_examples=100, deadline=None)
+    @hypothesis.given(
+        width=strategies.floats(1, 3000), depth=strategies.floats(1, 3000),
+        printer_x_cells=strategies.integers(1, 71), printer_y_cells=strategies.integers(1, 71),
+        margin_cells=strategies.integers(1, 3),
+    )
+    def check(width, depth, printer_x_cells, printer_y_cells, margin_cells):
+        printer_x, printer_y = printer_x_cells * GRID, printer_y_cells * GRID
+        try:
+            pieces = script_plan(width, depth, printer_x, printer_y, margin_cells)
+        except ValueError:
+            return
+        # The script does not check that its margins fit the bed; make_plan rejects those drawers.
+        margin_x = (width - (width - 2 * margin_cells * GRID) // GRID * GRID) / 2
+        margin_y = (depth - (depth - 2 * margin_cells * GRID) // GRID * GRID) / 2
+        hypothesis.assume(margin_x <= printer_x + 1e-6 and margin_y <= printer_y + 1e-6)
+        assert planner.verify_tiling(pieces, width, depth, printer_x, printer_y) == []
+
+    check()
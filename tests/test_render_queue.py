@@ -0,0 +1,34 @@
+"""
+Tests for the SQLite render queue shared by web processes and render workers.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+from render_queue import SqliteRenderQueue
+
+
+def test_workers_only_claim_tasks_for_their_openscad_version(tmp_path):
+    queue = SqliteRenderQueue(tmp_path / "queue.sqlite3")
+    task_id = queue.submit({"scad": "root:a.scad", "output": "cache:a.stl", "defines": {}, "generator": "bin",
+                            "openscad_version": "OpenSCAD version 2021.01"})
+    assert queue.claim("old", 60, "OpenSCAD version 2019.05") is None
+    task = queue.claim("new", 60, "OpenSCAD version 2021.01")
+    assert task["id"] == task_id
+    queue.complete(task_id, {"wall_seconds": 1.0})
+    assert queue.wait(task_id, 1) == {"state": "done", "profile": {"wall_seconds": 1.0}}
+
+
+def test_worker_version_is_the_most_common_live_one(tmp_path):
+    queue = SqliteRenderQueue(tmp_path / "queue.sqlite3", worker_timeout=60)
+    assert queue.worker_version() == ""
+    queue.heartbeat("a", "OpenSCAD version 2021.01")
+    queue.heartbeat("b", "OpenSCAD version 2024.12")
+    queue.heartbeat("c", "OpenSCAD version 2024.12")
+    assert queue.worker_version() == "OpenSCAD version 2024.12"
+    queue.worker_timeout = 0
+    assert queue.worker_version() == ""
@@ -0,0 +1,85 @@
+"""
+Tests for the single-flight render gate (webapp/scheduler.py).
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+from scheduler import RenderScheduler
+
+
+def test_concurrent_runs_of_one_key_share_the_render():
+    scheduler = RenderScheduler(4)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def render():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "stl"
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(scheduler.run, "key", render)
+        assert started.wait(5)
+        second = pool.submit(scheduler.run, "key", render)
+        # Let the second caller reach the shared flight before the render finishes.
+        time.sleep(0.1)
+        release.set()
+        assert first.result(5) == second.result(5) == "stl"
+    assert len(calls) == 1
+    assert scheduler.in_flight() == 0
+
+
+def test_failed_render_raises_in_every_waiter():
+    scheduler = RenderScheduler(4)
+    started, release = threading.Event(), threading.Event()
+
+    def render():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("render failed")
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(scheduler.run, "key", render)
+        assert started.wait(5)
+        second = pool.submit(scheduler.run, "key", render)
+        time.sleep(0.1)
+        release.set()
+        for future in (first, second):
+            with pytest.raises(RuntimeError, match="render failed"):
+                future.result(5)
+    assert scheduler.in_flight() == 0
+    assert scheduler.run("key", lambda: "retried") == "retried"
+
+
+def test_distinct_keys_run_at_most_limit_at_once():
+    limit = 2
+    scheduler = RenderScheduler(limit)
+    lock = threading.Lock()
+    running, peak = 0, 0
+
+    def render():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return True
+
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(lambda index: scheduler.run(f"key-{index}", render), range(6)))
+    assert all(results)
+    assert peak == limit
+    assert scheduler.running() == 0
@@ -0,0 +1,69 @@
+"""
+Tests for the STL cache index (webapp/stl_cache.py).
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+from stl_cache import StlCache
+
+
+def test_collect_keeps_entries_written_after_listing(tmp_path, monkeypatch):
+    cache = StlCache(tmp_path, 1024 ** 2)
+    listing = list(tmp_path.iterdir())
+    cache.path("bin-new").write_bytes(b"solid\n")
+    cache.add("bin-new")
+    # The entry appears between collect listing the directory and reading the index.
+    monkeypatch.setattr(Path, "iterdir", lambda self: iter(listing))
+    assert cache.collect()["dropped"] == 0
+    assert cache.hit("bin-new")
+    assert cache.path("bin-new").exists()
+
+
+def test_collect_drops_entries_without_files(tmp_path):
+    cache = StlCache(tmp_path, 1024 ** 2)
+    cache.path("bin-gone").write_bytes(b"solid\n")
+    cache.add("bin-gone")
+    cache.path("bin-gone").unlink()
+    assert cache.collect()["dropped"] == 1
+    assert not cache.hit("bin-gone")
+
+
+def put(cache: StlCache, key: str, size: int) -> None:
+    cache.path(key).write_bytes(b"\0" * size)
+    cache.add(key)
+
+
+def test_eviction_drops_least_recently_hit_entries(tmp_path):
+    cache = StlCache(tmp_path, 300)
+    put(cache, "bin-a", 100)
+    put(cache, "bin-b", 100)
+    put(cache, "bin-c", 100)
+    assert cache.hit("bin-a")
+    put(cache, "bin-d", 100)
+    assert not cache.path("bin-b").exists()
+    assert all(cache.path(key).exists() for key in ("bin-a", "bin-c", "bin-d"))
+    assert cache.total_bytes() == 300
+
+
+def test_purge_and_stats_by_prefix(tmp_path):
+    cache = StlCache(tmp_path, 1024 ** 2)
+    put(cache, "bin-a", 10)
+    put(cache, "pin-a", 20)
+    put(cache, "pin-b", 30)
+    put(cache, "0123abcd", 40)
+    cache.hit("pin-a")
+    stats = cache.stats()
+    assert stats["bytes"] == 100 and stats["entries"] == 4
+    assert stats["prefixes"]["pin-"] == {"entries": 2, "bytes": 50, "hits": 1}
+    assert stats["prefixes"]["piece"] == {"entries": 1, "bytes": 40, "hits": 0}
+    assert stats["prefixes"]["lid-"] == {"entries": 0, "bytes": 0, "hits": 0}
+
+    assert cache.purge("pin-") == {"entries": 2, "bytes": 50}
+    assert not cache.path("pin-a").exists() and cache.path("bin-a").exists()
+    assert cache.purge() == {"entries": 2, "bytes": 50}
+    assert cache.stats()["entries"] == 0
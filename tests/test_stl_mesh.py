@@ -0,0 +1,153 @@
+"""
+Tests for the STL mesh helpers used to derive baseplate pieces (webapp/stl_mesh.py).
+
+Meshes are checked for being closed (every edge shared by exactly two
+triangles with opposite directions) and for their volume. The comparison with
+a direct OpenSCAD render is skipped when OpenSCAD is not installed.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+from stl_mesh import clip_axis, read_stl, tile_cells, weld
+
+PITCH = 42.0
+
+
+def heightfield(xs, ys, height) -> np.ndarray:
+    """Closed mesh between z = 0 and z = height(x, y) over the grid ``xs`` x ``ys``."""
+    x, y = np.meshgrid(xs, ys, indexing="ij")
+    top = np.stack([x, y, height(x, y)], axis=-1)
+    bottom = np.stack([x, y, np.zeros_like(x)], axis=-1)
+    triangles = []
+    for i in range(len(xs) - 1):
+        for j in range(len(ys) - 1):
+            t00, t10, t11, t01 = top[i, j], top[i + 1, j], top[i + 1, j + 1], top[i, j + 1]
+            b00, b10, b11, b01 = bottom[i, j], bottom[i + 1, j], bottom[i + 1, j + 1], bottom[i, j + 1]
+            triangles += [(t00, t10, t11), (t00, t11, t01), (b00, b11, b10), (b00, b01, b11)]
+    last_x, last_y = len(xs) - 1, len(ys) - 1
+    for i in range(last_x):
+        triangles += [(bottom[i, 0], bottom[i + 1, 0], top[i + 1, 0]), (bottom[i, 0], top[i + 1, 0], top[i, 0])]
+        triangles += [(bottom[i + 1, last_y], bottom[i, last_y], top[i, last_y]),
+                      (bottom[i + 1, last_y], top[i, last_y], top[i + 1, last_y])]
+    for j in range(last_y):
+        triangles += [(bottom[0, j + 1], bottom[0, j], top[0, j]), (bottom[0, j + 1], top[0, j], top[0, j + 1])]
+        triangles += [(bottom[last_x, j], bottom[last_x, j + 1], top[last_x, j + 1]),
+                      (bottom[last_x, j], top[last_x, j + 1], top[last_x, j])]
+    return np.asarray(triangles, dtype=np.float64)
+
+
+def box(cells: tuple[int, int], height: float = 5.0) -> np.ndarray:
+    extent_x, extent_y = cells[0] * PITCH / 2, cells[1] * PITCH / 2
+    return heightfield([-extent_x, extent_x], [-extent_y, extent_y], lambda x, y: np.full_like(x, height))
+
+
+def bumps(cells: tuple[int, int], samples_per_cell: float) -> np.ndarray:
+    """A plate with one bump per cell, sampled on a grid that does not line up with the cells."""
+    extent_x, extent_y = cells[0] * PITCH / 2, cells[1] * PITCH / 2
+
+    def height(x, y):
+        return 4 - np.cos(2 * np.pi * (x + extent_x) / PITCH) - np.cos(2 * np.pi * (y + extent_y) / PITCH)
+
+    xs = np.linspace(-extent_x, extent_x, round(cells[0] * samples_per_cell) + 1)
+    ys = np.linspace(-extent_y, extent_y, round(cells[1] * samples_per_cell) + 1)
+    return heightfield(xs, ys, height)
+
+
+def bad_edges(triangles: np.ndarray) -> int:
+    """Number of edges not shared by exactly two oppositely directed triangle edges."""
+    vertices = [tuple(vertex) for vertex in np.round(triangles.reshape(-1, 3), 4)]
+    directed = Counter()
+    for index in range(0, len(vertices), 3):
+        a, b, c = vertices[index:index + 3]
+        directed.update([(a, b), (b, c), (c, a)])
+    undirected = {tuple(sorted(edge)) for edge in directed}
+    return sum(1 for a, b in undirected if directed[(a, b)] != 1 or directed[(b, a)] != 1)
+
+
+def volume(triangles: np.ndarray) -> float:
+    return float(np.einsum("ij,ij->i", triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])).sum() / 6)
+
+
+def test_clip_axis_keeps_mesh_closed():
+    mesh = box((3, 3))
+    clipped = clip_axis(clip_axis(mesh, 0, 10.3), 1, -20.7)
+    for axis, value in ((0, 10.3), (1, -20.7)):
+        coordinates = clipped[:, :, axis] - value
+        assert not ((coordinates > 1e-6).any(axis=1) & (coordinates < -1e-6).any(axis=1)).any()
+    assert bad_edges(clipped) == 0
+    assert volume(clipped) == pytest.approx(volume(mesh))
+
+
+def test_clip_axis_through_vertices():
+    mesh = bumps((2, 2), 4)
+    clipped = clip_axis(mesh, 0, 0.0)
+    assert bad_edges(clipped) == 0
+    assert volume(clipped) == pytest.approx(volume(mesh))
+
+
+def test_weld_snaps_vertices_and_drops_collapsed_triangles():
+    mesh = box((1, 1))
+    noisy = mesh + np.random.default_rng(1).uniform(-1e-6, 1e-6, mesh.shape)
+    collapsed = np.array([[[0.0, 0.0, 0.0], [1e-6, 0.0, 0.0], [0.0, 1.0, 0.0]]])
+    welded = weld(np.concatenate([noisy, collapsed]))
+    assert len(welded) == len(mesh)
+    assert len(np.unique(welded.reshape(-1, 3), axis=0)) == 8
+    assert bad_edges(welded) == 0
+
+
+@pytest.mark.parametrize("cells", [(5, 4), (4, 4), (3, 7), (10, 2)])
+def test_tile_cells_box_is_closed(cells):
+    tiled = tile_cells(box((3, 3)), (3, 3), cells, PITCH)
+    assert bad_edges(tiled) == 0
+    assert volume(tiled) == pytest.approx(volume(box(cells)))
+
+
+@pytest.mark.parametrize("cells", [(5, 4), (6, 3)])
+def test_tile_cells_matches_direct_mesh(cells):
+    tiled = tile_cells(bumps((3, 3), 5.5), (3, 3), cells, PITCH)
+    direct = bumps(cells, 5.5)
+    assert bad_edges(tiled) == 0
+    np.testing.assert_allclose(tiled.reshape(-1, 3).min(axis=0), direct.reshape(-1, 3).min(axis=0), atol=0.1)
+    np.testing.assert_allclose(tiled.reshape(-1, 3).max(axis=0), direct.reshape(-1, 3).max(axis=0), atol=0.1)
+    assert volume(tiled) == pytest.approx(volume(direct), rel=2e-3)
+
+
+CELL_SCAD = """
+pitch = 42;
+translate([-cells[0] * pitch / 2, -cells[1] * pitch / 2, 0]) {
+    cube([cells[0] * pitch, cells[1] * pitch, 2]);
+    for (x = [0:cells[0] - 1], y = [0:cells[1] - 1])
+        translate([(x + 0.5) * pitch, (y + 0.5) * pitch, 2]) cylinder(h = 3, r1 = 15, r2 = 5, $fn = 24);
+}
+"""
+
+
+def test_tile_cells_matches_openscad_render(tmp_path):
+    openscad = os.environ.get("OPENSCAD_BIN") or shutil.which("openscad")
+    if not openscad:
+        pytest.skip("OpenSCAD is not installed")
+    scad_path = tmp_path / "cells.scad"
+    scad_path.write_text(CELL_SCAD, encoding="utf-8")
+
+    def render(cells: tuple[int, int]) -> np.ndarray:
+        stl_path = tmp_path / f"{cells[0]}x{cells[1]}.stl"
+        subprocess.run([openscad, "-D", f"cells=[{cells[0]},{cells[1]}]", "-o", str(stl_path), str(scad_path)],
+                       check=True, capture_output=True)
+        return read_stl(stl_path)
+
+    tiled = tile_cells(render((3, 3)), (3, 3), (5, 4), PITCH)
+    direct = render((5, 4))
+    assert bad_edges(tiled) == 0
+    assert volume(tiled) == pytest.approx(volume(direct), rel=1e-4)
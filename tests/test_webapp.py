@@ -0,0 +1,234 @@
+"""
+Tests for the web service (webapp/app.py) against a stand-in OpenSCAD.
+
+The stand-in writes a 10 mm cube for every render, which is enough to exercise
+caching, batching and bundling without the real library.
+"""
+from __future__ import annotations
+
+import importlib
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+FAKE_OPENSCAD = '''#!{python}
+import sys
+args = sys.argv[1:]
+if "--version" in args or "--help" in args:
+    print("OpenSCAD version 2021.01", file=sys.stderr)
+    sys.exit(0)
+output = args[args.index("-o") + 1]
+v = [(x, y, z) for x in (0, 10) for y in (0, 10) for z in (0, 10)]
+faces = [(0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5), (0, 4, 5), (0, 5, 1),
+         (2, 3, 7), (2, 7, 6), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)]
+with open(output, "w") as stream:
+    stream.write("solid OpenSCAD_Model\\n")
+    for face in faces:
+        stream.write("facet normal 0 0 0\\nouter loop\\n")
+        stream.writelines("vertex %g %g %g\\n" % v[index] for index in face)
+        stream.write("endloop\\nendfacet\\n")
+    stream.write("endsolid OpenSCAD_Model\\n")
+'''
+
+PLAN = {"width": 413, "depth": 408, "printer_x_cells": 6, "printer_y_cells": 6}
+
+
+@pytest.fixture(scope="module")
+def web(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("webapp")
+    openscad = directory / "openscad"
+    openscad.write_text(FAKE_OPENSCAD.format(python=sys.executable), encoding="utf-8")
+    openscad.chmod(0o755)
+    with pytest.MonkeyPatch.context() as patch:
+        # Only read while app is imported; restored so other test modules do not see the stand-in.
+        patch.setenv("OPENSCAD_BIN", str(openscad))
+        patch.setenv("GRIDFINITY_CACHE_DIR", str(directory / "cache"))
+        # The cube cannot be split into batch pieces or tiled into cells.
+        patch.setenv("GRIDFINITY_RENDER_BATCH", "1")
+        patch.setenv("GRIDFINITY_TILE_CENTER", "0")
+        app = importlib.import_module("app")
+    app.ACTION_LOG.path = directory / "log" / "action.log"
+    yield app
+    app.ACTION_LOG.close()
+
+
+def test_render_pieces_with_every_piece_cached(web):
+    values = web.parse_payload(dict(PLAN))
+    pieces = web.plan_for(values)["pieces"]
+    first = [future.result() for future in web.render_pieces(pieces, values["grid"], values["style"], values["magnets"])]
+    again = [future.result() for future in web.render_pieces(pieces, values["grid"], values["style"], values["magnets"])]
+    assert again == first
+
+
+def test_download_after_pieces_are_cached(web):
+    values = web.parse_payload(dict(PLAN, width=500))
+    pieces = web.plan_for(values)["pieces"]
+    for future in web.render_pieces(pieces, values["grid"], values["style"], values["magnets"]):
+        future.result()
+
+    response = web.app.test_client().post("/api/download", json=dict(PLAN, width=500))
+    assert response.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(response.data)).namelist()
+    assert len(names) == len(pieces) + 2
+
+
+def test_warmup_counts_bundle_jobs(web):
+    import warmup
+
+    client = web.app.test_client()
+    job = client.post("/api/jobs", json=dict(PLAN, kind="bundle", width=700)).get_json()
+    assert job["state"] == "queued"
+    web.ACTION_LOG.close()
+    configurations = warmup.configurations_from_log(web.ACTION_LOG.path, 10, {"plan"})
+    assert ("plan", 700.0) in [(kind, params["width"]) for kind, params, _ in configurations]
+    assert client.get(job["status_url"]).status_code == 200
+
+
+def test_jobs_are_capped(web, monkeypatch):
+    from jobs import JobStore
+
+    monkeypatch.setattr(web, "JOBS", JobStore(8))
+    monkeypatch.setattr(web, "JOB_MAX_OUTSTANDING", 1)
+    web.JOBS.create("bundle")
+    response = web.app.test_client().post("/api/jobs", json=dict(PLAN, kind="bundle"))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"]
+
+
+def test_render_bin_rerenders_evicted_parts(web, monkeypatch):
+    render_bin_part = web.render_bin_part
+
+    def evicted(*args, **kwargs):
+        path = render_bin_part(*args, **kwargs)
+        path.unlink()
+        return path
+
+    monkeypatch.setattr(web, "render_bin_part", evicted)
+    params = web.parse_bin_payload({"gridx": 3, "gridy": 3})
+    assert web.render_bin(params).exists()
+    assert web.STL_CACHE.path(web.bin_part_render(params, "base")[0]).exists()
+
+
+def test_render_piece_rerenders_evicted_canonical_piece(web, monkeypatch):
+    from planner import canonical_piece
+
+    piece = {"w": 87.0, "h": 100.0, "kind": "corner_rt"}
+    canonical, symmetry = canonical_piece(piece)
+    assert symmetry != "identity"
+    cached_render = web.cached_render
+
+    def evicted(cache_key, render, *args, **kwargs):
+        path = cached_render(cache_key, render, *args, **kwargs)
+        if cache_key == web.piece_cache_key(canonical, 42.0, 0, False)[1]:
+            path.unlink()
+        return path
+
+    monkeypatch.setattr(web, "cached_render", evicted)
+    assert web.render_piece(piece, 42.0, 0, False).exists()
+    assert web.STL_CACHE.path(web.piece_cache_key(canonical, 42.0, 0, False)[1]).exists()
+
+
+def test_cached_bundle_is_served_without_computing_the_plan(web, monkeypatch):
+    from plan_store import PlanStore
+
+    client = web.app.test_client()
+    first = client.post("/api/download", json=dict(PLAN, width=600))
+    assert first.status_code == 200
+    bundle = first.data
+
+    def unexpected(values):
+        raise AssertionError("plan computed for a cached bundle")
+
+    monkeypatch.setattr(web, "PLAN_STORE", PlanStore(8))
+    monkeypatch.setattr(web, "plan_for", unexpected)
+    again = client.post("/api/download", json=dict(PLAN, width=600))
+    assert again.status_code == 200
+    assert again.data == bundle
+
+
+def test_download_rejects_drawers_the_planner_rejects(web):
+    response = web.app.test_client().post("/api/download", json=dict(PLAN, width=50, depth=50))
+    assert response.status_code == 400
+    assert response.get_json()["error"]
+
+
+def test_admin_cache_api_requires_the_token(web, monkeypatch):
+    client = web.app.test_client()
+    monkeypatch.setattr(web, "ADMIN_TOKEN", "")
+    assert client.get("/api/admin/cache").status_code == 404
+    monkeypatch.setattr(web, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/cache").status_code == 403
+    assert client.get("/api/admin/cache", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.delete("/api/admin/cache?prefix=all").status_code == 403
+    assert client.post("/api/admin/cache/gc").status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    stats = client.get("/api/admin/cache", headers=headers).get_json()
+    assert set(stats["prefixes"]) == {"bin-", "pin-", "lid-", "bundle-", "piece"}
+    assert client.delete("/api/admin/cache?prefix=nope", headers=headers).status_code == 400
+    assert client.post("/api/admin/cache/gc", headers=headers).status_code == 200
+
+
+def test_bundle_survives_pieces_evicted_while_streaming(web, monkeypatch):
+    precompressed_entry = web.precompressed_entry
+    evicted = []
+
+    def evict_after_listing(name, deflate_path, meta, restore=None):
+        entry = precompressed_entry(name, deflate_path, meta, restore)
+        # Gone after its metadata was read, before its bytes are written.
+        web.STL_CACHE.purge(web.entry_prefix(deflate_path.name.split(".")[0]))
+        evicted.append(name)
+        return entry
+
+    monkeypatch.setattr(web, "precompressed_entry", evict_after_listing)
+    response = web.app.test_client().post("/api/download", json=dict(PLAN, width=800))
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.testzip() is None
+    assert len(archive.namelist()) == len(evicted) + 2
+
+
+def test_piece_stl_content_encodings(web):
+    import gzip
+    import zlib
+
+    client = web.app.test_client()
+    request = dict(PLAN, piece_id=1)
+    raw = client.post("/api/piece-stl", json=request, headers={"Accept-Encoding": "identity"})
+    assert raw.status_code == 200 and "Content-Encoding" not in raw.headers
+    for encoding, decompress in (("gzip", gzip.decompress), ("deflate", zlib.decompress)):
+        response = client.post("/api/piece-stl", json=request, headers={"Accept-Encoding": encoding})
+        assert response.headers["Content-Encoding"] == encoding
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert int(response.headers["Content-Length"]) == len(response.data)
+        assert decompress(response.data) == raw.data
+
+
+def test_immutable_stl_urls(web, monkeypatch):
+    client = web.app.test_client()
+    piece = client.post("/api/piece-stl", json=dict(PLAN, piece_id=1), headers={"Accept-Encoding": "identity"})
+    url = piece.headers["X-Stl-Url"]
+    cache_key = url.rsplit("/", 1)[1].removesuffix(".stl")
+
+    first = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert first.status_code == 200 and first.data == piece.data
+    assert first.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    etag = first.headers["ETag"]
+    again = client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+
+    monkeypatch.setattr(web, "STL_ACCEL", "nginx")
+    accelerated = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert accelerated.headers["X-Accel-Redirect"] == f"{web.STL_ACCEL_PREFIX}/{cache_key}.stl"
+    assert accelerated.data == b""
+
+    assert client.get("/stl/" + "0" * 64 + ".stl").status_code == 404
+    assert not web.STL_KEY_PATTERN.fullmatch("Not_A-Key")
+    assert client.get("/stl/Not_A-Key.stl").status_code == 404
+    assert client.get("/stl/bundle-" + "0" * 64 + ".stl").status_code == 404
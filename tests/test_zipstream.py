@@ -0,0 +1,52 @@
+"""
+Tests for the streamed ZIP64 writer (webapp/zipstream.py).
+"""
+from __future__ import annotations
+
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "webapp"))
+
+from compression import deflate_file
+from zipstream import ZIP64_VERSION, bytes_entry, precompressed_entry, stream_zip
+
+
+def test_stream_zip_round_trips_stored_deflate_entries(tmp_path):
+    stl = tmp_path / "piece.stl"
+    stl.write_bytes(b"solid piece\n" + b"facet normal 0 0 1\n" * 50000 + b"endsolid piece\n")
+    meta = deflate_file(stl, tmp_path / "piece.stl.deflate")
+    entries = [
+        bytes_entry("plan.json", b'{"pieces": []}'),
+        precompressed_entry("01_piece.stl", tmp_path / "piece.stl.deflate", meta),
+        bytes_entry("说明.txt", "单位：毫米\n".encode("utf-8")),
+    ]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_zip(entries))))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["plan.json", "01_piece.stl", "说明.txt"]
+    assert archive.read("01_piece.stl") == stl.read_bytes()
+    assert all(info.create_version == ZIP64_VERSION for info in archive.infolist())
+
+
+def test_stream_zip_past_the_classic_entry_limit():
+    # More members than the 16-bit counts of the classic end record hold.
+    count = 0x10000 + 5
+    data = b"".join(stream_zip(bytes_entry(f"{index}.txt", b"x") for index in range(count)))
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert len(archive.infolist()) == count
+    assert archive.read(f"{count - 1}.txt") == b"x"
+
+
+def test_precompressed_entry_restores_a_missing_file(tmp_path):
+    stl = tmp_path / "piece.stl"
+    stl.write_bytes(b"solid piece\nendsolid piece\n")
+    deflate_path = tmp_path / "piece.stl.deflate"
+    meta = deflate_file(stl, deflate_path)
+    deflate_path.unlink()
+    entry = precompressed_entry("piece.stl", deflate_path, meta, lambda: deflate_file(stl, deflate_path))
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_zip([entry]))))
+    assert archive.testzip() is None
+    assert archive.read("piece.stl") == stl.read_bytes()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+
+class ActionLog:
+    """JSON-lines action log written by a background thread.
+
+    ``record`` only enqueues, so requests never wait for the disk. The writer
+    appends batches of up to ``batch_size`` records at least every
+    ``flush_seconds`` and rotates the file when it would grow past ``max_bytes``
+    or when a new ``rotate_seconds`` period (in ``timezone``) has started since
+    its last write, keeping ``backups`` rotated files. Appends and rotation
+    happen under an ``flock`` on ``<path>.lock``, so every worker process can
+    share one log. When the queue is full, records are dropped and counted in
+    a ``log.dropped`` record instead of blocking requests.
+    """
+
+    def __init__(self, path: Path, timezone, *, max_bytes: int = 64 * 1024 ** 2, backups: int = 10,
+                 rotate_seconds: float = 86400, flush_seconds: float = 1.0, batch_size: int = 500,
+                 queue_size: int = 10000, log_error: Callable[..., None] | None = None):
+        self.path = Path(path)
+        self.timezone = timezone
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rotate_seconds = rotate_seconds
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.log_error = log_error
+        self._queue: queue.Queue[dict | None] = queue.Queue(maxsize=queue_size)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def record(self, action: str, *, ip: str, status: int | None = None, details: dict | None = None) -> None:
+        entry = {"time": datetime.now(self.timezone).isoformat(timespec="seconds"), "ip": ip, "action": action}
+        if status is not None:
+            entry["status"] = status
+        if details:
+            entry["details"] = details
+        self._start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    def _start(self) -> None:
+        # Started lazily so that a process forked after import (gunicorn) gets its own writer.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="action-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush everything queued so far and stop the writer."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch: list[dict] = []
+            deadline = time.monotonic() + self.flush_seconds
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+            with self._dropped_lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                batch.append({"time": datetime.now(self.timezone).isoformat(timespec="seconds"),
+                              "action": "log.dropped", "details": {"count": dropped}})
+            if batch:
+                try:
+                    self.write(batch)
+                except OSError:
+                    # Logging must never make model generation unavailable.
+                    if self.log_error:
+                        self.log_error("Unable to write action log: %s", self.path)
+            if stop:
+                return
+
+    def write(self, entries: list[dict]) -> None:
+        """Append ``entries`` to the log, rotating it first if needed."""
+        data = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in entries).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._rotate_if_needed(len(data))
+                # O_APPEND writes of one buffer are not interleaved with other appenders.
+                descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(descriptor, data)
+                finally:
+                    os.close(descriptor)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _period(self, timestamp: float) -> int:
+        offset = datetime.fromtimestamp(timestamp, self.timezone).utcoffset()
+        return int((timestamp + (offset.total_seconds() if offset else 0)) // self.rotate_seconds)
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        if not stat.st_size:
+            return
+        too_big = stat.st_size + incoming > self.max_bytes
+        expired = self.rotate_seconds > 0 and self._period(stat.st_mtime) != self._period(time.time())
+        if not (too_big or expired):
+            return
+        stamp = datetime.fromtimestamp(stat.st_mtime, self.timezone).strftime("%Y%m%d-%H%M%S")
+        target = self.path.with_name(f"{self.path.name}.{stamp}")
+        counter = 1
+        while target.exists():
+            target = self.path.with_name(f"{self.path.name}.{stamp}-{counter}")
+            counter += 1
+        os.replace(self.path, target)
+        for old in self.rotated()[:-self.backups or None]:
+            old.unlink(missing_ok=True)
+
+    def rotated(self) -> list[Path]:
+        """Rotated log files, oldest first."""
+        prefix = self.path.name + "."
+        return sorted(
+            path for path in self.path.parent.glob(prefix + "*")
+            if path.name[len(prefix):][:1].isdigit()
+        )
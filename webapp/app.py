@@ -1,63 +1,194 @@
 from __future__ import annotations
 
-import io
 import hashlib
+import hmac
 import json
+import math
 import os
+import re
 import shutil
 import subprocess
-import tempfile
 import threading
-import zipfile
-from datetime import datetime
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable
 from zoneinfo import ZoneInfo
 
-from flask import Flask, jsonify, render_template, request, send_file
+from flask import Flask, Response, g, jsonify, render_template, request, send_file, stream_with_context
 
-from planner import fit_for_kind, make_plan
+from action_log import ActionLog
+from compression import ENCODINGS, brotli, brotli_file, deflate_file
+from fingerprints import SourceFingerprints, library_paths_from_environment
+from jobs import FINISHED as JOB_FINISHED, JobStore
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from openscad import OpenScad
+from plan_store import PlanStore
+from planner import SYMMETRIES, canonical_piece, fit_for_kind, make_plan, optimize_plan, plan_table
+from render_queue import SqliteRenderQueue, store_name
+from scheduler import RenderScheduler
+from stl_cache import PIECE_PREFIX, PREFIXES, StlCache, entry_prefix
+from stl_mesh import read_stl, split_by_x, tile_cells, transform_xy, write_stl
+from zipstream import bytes_entry, precompressed_entry, stream_zip
 
 
 ROOT = Path(__file__).resolve().parents[1]
 OPENSCAD = os.environ.get("OPENSCAD_BIN") or shutil.which("openscad") or "/usr/bin/openscad"
 app = Flask(__name__)
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024
-CACHE_DIR = Path("/tmp/gridfinity-stl-cache")
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-RENDER_LOCK = threading.Lock()
+CACHE_DIR = Path(os.environ.get("GRIDFINITY_CACHE_DIR") or ROOT / "cache" / "stl")
+STL_CACHE = StlCache(CACHE_DIR, int(os.environ.get("GRIDFINITY_CACHE_MAX_BYTES") or 4 * 1024 ** 3))
+STL_CACHE.start_gc(float(os.environ.get("GRIDFINITY_CACHE_GC_SECONDS") or 900), app.logger.exception)
+BUNDLE_WRITERS: set[str] = set()
+BUNDLE_WRITERS_LOCK = threading.Lock()
+ADMIN_TOKEN = os.environ.get("GRIDFINITY_ADMIN_TOKEN", "")
+METRICS = Registry()
+REQUEST_SECONDS = METRICS.histogram(
+    "gridfinity_http_request_duration_seconds", "Time to produce a response (streamed bodies excluded).",
+    ("endpoint", "method", "status"),
+)
+RENDER_SECONDS = METRICS.histogram(
+    "gridfinity_render_duration_seconds", "Successful OpenSCAD render time.", ("generator",),
+)
+RENDER_WAIT_SECONDS = METRICS.histogram(
+    "gridfinity_render_wait_seconds", "Time spent waiting for a render slot or for an identical render.", ("reason",),
+)
+CACHE_LOOKUPS = METRICS.counter(
+    "gridfinity_cache_lookups_total", "STL cache lookups by result.", ("generator", "result"),
+)
+OPENSCAD_FAILURES = METRICS.counter(
+    "gridfinity_openscad_failures_total", "OpenSCAD runs that failed, timed out or fell back to the default backend.",
+    ("generator", "reason"),
+)
+OPENSCAD_RUNNING = METRICS.gauge("gridfinity_openscad_processes", "OpenSCAD child processes running.")
+OPENSCAD_RUNNER = OpenScad(
+    OPENSCAD, ROOT, logger=app.logger, running=OPENSCAD_RUNNING, failures=OPENSCAD_FAILURES, seconds=RENDER_SECONDS,
+)
+# Renders of the same cache key are shared; different keys run side by side.
+RENDER_SCHEDULER = RenderScheduler(
+    max(1, int(os.environ.get("GRIDFINITY_RENDER_CONCURRENCY") or os.cpu_count() or 1)),
+    on_wait=lambda reason, seconds: RENDER_WAIT_SECONDS.observe(seconds, reason=reason),
+)
+METRICS.gauge(
+    "gridfinity_renders_in_flight", "Distinct cache keys being rendered or queued for a slot.",
+    collect=lambda: RENDER_SCHEDULER.in_flight(),
+)
+METRICS.gauge(
+    "gridfinity_renders_running", "Renders holding a scheduler slot.", collect=lambda: RENDER_SCHEDULER.running(),
+)
+METRICS.gauge(
+    "gridfinity_cache_bytes", "Bytes in the STL cache directory by entry prefix.", ("prefix",),
+    collect=lambda: {(prefix.rstrip("-"),): item["bytes"] for prefix, item in STL_CACHE.stats()["prefixes"].items()},
+)
+METRICS.gauge("gridfinity_cache_max_bytes", "STL cache quota.", collect=lambda: STL_CACHE.max_bytes)
+# Each job only waits on its own OpenSCAD child process, so a thread pool is
+# enough to keep every core busy while bounding the number of renders.
+RENDER_WORKERS = max(1, int(os.environ.get("GRIDFINITY_RENDER_WORKERS") or os.cpu_count() or 1))
+RENDER_POOL = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="openscad")
+# With GRIDFINITY_RENDER_QUEUE set to a SQLite file, OpenSCAD runs in render_worker.py
+# processes (on this host or on others sharing the queue file and GRIDFINITY_CACHE_DIR)
+# instead of in the web process; renders waiting longer than the timeout fail.
+RENDER_QUEUE_PATH = os.environ.get("GRIDFINITY_RENDER_QUEUE", "")
+RENDER_QUEUE = SqliteRenderQueue(Path(RENDER_QUEUE_PATH)) if RENDER_QUEUE_PATH else None
+RENDER_QUEUE_TIMEOUT = float(os.environ.get("GRIDFINITY_RENDER_QUEUE_TIMEOUT") or 1800)
+STORE_BASES = {"cache": CACHE_DIR, "root": ROOT}
+if RENDER_QUEUE is not None:
+    METRICS.gauge(
+        "gridfinity_render_queue_tasks", "Render queue tasks by state.", ("state",),
+        collect=lambda: {(state,): count for state, count in RENDER_QUEUE.counts().items()},
+    )
+# Generated SCAD includes the library relative to ROOT (found through OPENSCADPATH),
+# and cache keys hash that code together with the fingerprint of everything it
+# includes, so keys are the same for every checkout and change when the library
+# or the OpenSCAD binary does. The watcher notices edits without per-request hashing.
+# With a render queue the OpenSCAD that counts is the one the workers report.
+SOURCES = SourceFingerprints(
+    ROOT, Path(OPENSCAD), library_paths_from_environment(),
+    version=RENDER_QUEUE.worker_version if RENDER_QUEUE is not None else None,
+)
+SOURCES.start_watcher(float(os.environ.get("GRIDFINITY_SOURCE_POLL_SECONDS") or 5), app.logger.exception)
+# Bump when the ZIP layout, the baseplate SCAD template or TILE_FORMAT changes.
+BUNDLE_FORMAT = 2
+PLAN_BATCH_MAX_ROWS = 100_000
+# Optional hand-off of /stl/<key>.stl bodies to the front server: "nginx" sends
+# X-Accel-Redirect to GRIDFINITY_STL_ACCEL_PREFIX/<file> (an internal location
+# aliased to the cache directory), "sendfile" sends X-Sendfile with the file path.
+STL_ACCEL = os.environ.get("GRIDFINITY_STL_ACCEL", "")
+STL_ACCEL_PREFIX = os.environ.get("GRIDFINITY_STL_ACCEL_PREFIX", "/_stl-cache").rstrip("/")
+STL_KEY_PATTERN = re.compile(r"[0-9a-z][0-9a-z_-]{0,127}")
+PLAN_STORE = PlanStore(int(os.environ.get("GRIDFINITY_PLAN_STORE_SIZE") or 512))
+# Background jobs (POST /api/jobs) run on their own pool so that a job waiting on
+# piece renders never holds a RENDER_POOL worker.
+JOBS = JobStore(int(os.environ.get("GRIDFINITY_JOB_STORE_SIZE") or 256))
+JOB_POOL = ThreadPoolExecutor(
+    max_workers=max(1, int(os.environ.get("GRIDFINITY_JOB_WORKERS") or 2)), thread_name_prefix="job",
+)
+# Queued and running jobs; further POST /api/jobs get 429 until some finish.
+JOB_MAX_OUTSTANDING = max(1, int(os.environ.get("GRIDFINITY_JOB_MAX_OUTSTANDING") or 16))
+JOB_POLL_SECONDS = 2
+# Uncached plan pieces are rendered up to this many per OpenSCAD run, saving the
+# process start and library parse that dominate small pieces.
+BATCH_SIZE = max(1, int(os.environ.get("GRIDFINITY_RENDER_BATCH") or 8))
+BATCH_GAP = 10.0
+# Center pieces larger than 3x3 cells are tiled from a cached <=3x3 render instead
+# of being rendered; set GRIDFINITY_TILE_CENTER=0 to always render them.
+TILE_CENTER = os.environ.get("GRIDFINITY_TILE_CENTER", "1") != "0"
+# Part of the cache key of tiled pieces; bump when stl_mesh.tile_cells output changes.
+TILE_FORMAT = 2
+# Tessellation tiers as multipliers of each generator's $fa/$fs. Previews start with
+# "draft" and swap in "standard"; downloads and ZIP bundles always use PRINT_QUALITY.
+QUALITY_TIERS = {"draft": 3.0, "standard": 1.0, "fine": 0.5}
+PRINT_QUALITY = "standard"
 PIN_SCAD_PATH = ROOT / "011_BOSL2原版双头弹性插销.scad"
 LID_SCAD_PATH = ROOT / "third_party" / "gridfinity_extended_openscad" / "gridfinity_lid.scad"
 ACTION_LOG_PATH = ROOT / "log" / "action.log"
-ACTION_LOG_LOCK = threading.Lock()
 ACTION_TIMEZONE = ZoneInfo("Asia/Shanghai")
+# JSON lines written off the request path; rotated at GRIDFINITY_ACTION_LOG_MAX_BYTES
+# or every GRIDFINITY_ACTION_LOG_ROTATE_SECONDS (local midnight by default, 0 disables).
+ACTION_LOG = ActionLog(
+    ACTION_LOG_PATH,
+    ACTION_TIMEZONE,
+    max_bytes=int(os.environ.get("GRIDFINITY_ACTION_LOG_MAX_BYTES") or 64 * 1024 ** 2),
+    backups=int(os.environ.get("GRIDFINITY_ACTION_LOG_BACKUPS") or 10),
+    rotate_seconds=float(os.environ.get("GRIDFINITY_ACTION_LOG_ROTATE_SECONDS") or 86400),
+    log_error=app.logger.exception,
+)
 
 
 def _log_text(value, maximum: int = 120) -> str:
-    return str(value).replace("\n", " ").replace("\r", " ").replace("|", "/")[:maximum]
+    return str(value)[:maximum]
+
+
+def _log_value(value):
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    return _log_text(value)
 
 
 def write_action_log(action: str, details: dict | None = None, *, status: int | None = None) -> None:
-    parts = [
-        datetime.now(ACTION_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"),
-        f"IP {_log_text(request.remote_addr or 'unknown')}",
-        _log_text(action, 160),
-    ]
-    if status is not None:
-        parts.append(f"状态 {status}")
-    if details:
-        detail_text = " ".join(
-            f"{_log_text(key, 40)}={_log_text(value)}"
-            for key, value in list(details.items())[:15]
+    details = {
+        _log_text(key, 40): _log_value(value)
+        for key, value in list((details or {}).items())[:15]
+    }
+    ACTION_LOG.record(
+        _log_text(action, 160), ip=_log_text(request.remote_addr or "unknown"), status=status, details=details,
+    )
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.monotonic()
+
+
+@app.after_request
+def record_request_metrics(response):
+    if "request_started" in g:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(
+            time.monotonic() - g.request_started,
+            endpoint=endpoint, method=request.method, status=response.status_code,
         )
-        if detail_text:
-            parts.append(detail_text)
-    try:
-        ACTION_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with ACTION_LOG_LOCK, ACTION_LOG_PATH.open("a", encoding="utf-8") as stream:
-            stream.write(" | ".join(parts) + "\n")
-    except OSError:
-        # Logging must never make model generation unavailable.
-        app.logger.exception("Unable to write action log: %s", ACTION_LOG_PATH)
+    return response
 
 
 @app.after_request
@@ -73,14 +204,18 @@ def record_request_action(response):
         "/api/bin-stl": "生成盒子 STL",
         "/api/pin-stl": "生成插销 STL",
         "/api/lid-stl": "生成防尘盖 STL",
+        "/api/jobs": "提交后台生成任务",
     }
     action = action_names.get(request.path)
     if action:
         values = request_values() if request.path.startswith("/api/") else {}
+        if "plan_values" in g:
+            # Requests by plan_id only carry the id; log the parameters it stands for.
+            values = {**values, **logged_plan_values(g.plan_values)}
         detail_keys = (
             "width", "depth", "printer_x_cells", "printer_y_cells", "piece_id", "download",
             "gridx", "gridy", "gridz", "divx", "divy", "cut_mode", "target_center_length",
-            "lid_style", "magnets",
+            "lid_style", "magnets", "optimize", "kind",
         )
         details = {key: values[key] for key in detail_keys if key in values}
         write_action_log(action, details, status=response.status_code)
@@ -94,8 +229,8 @@ def request_values():
     return json_body if isinstance(json_body, dict) else request.form.to_dict()
 
 
-def parse_payload():
-    body = request_values()
+def parse_payload(body: dict | None = None):
+    body = request_values() if body is None else body
     try:
         if "printer_x_cells" in body:
             printer_x_cells_raw = float(body["printer_x_cells"])
@@ -115,11 +250,16 @@ def parse_payload():
             "style": int(body.get("style", 4)),
             "magnets": body.get("magnets", True) if isinstance(body.get("magnets", True), bool)
             else str(body.get("magnets", True)).lower() in ("1", "true", "yes", "on"),
+            "optimize": body.get("optimize") is True
+            or str(body.get("optimize", "")).lower() in ("1", "true", "yes", "on"),
         }
+        values["max_margin_cells"] = int(body.get("max_margin_cells", values["min_margin_cells"]))
     except (TypeError, ValueError):
         raise ValueError("请输入有效的数字")
     if not 0 <= values["style"] <= 4:
         raise ValueError("底板样式无效")
+    if not values["min_margin_cells"] <= values["max_margin_cells"] <= 10:
+        raise ValueError("最大边缘格数需要在最小边缘格数到 10 之间")
     if any(values[name] > 3000 for name in ("width", "depth", "printer_x", "printer_y")):
         raise ValueError("尺寸不能超过 3000 mm")
     for raw_cells, label, value_name in (
@@ -135,19 +275,115 @@ def parse_payload():
     return values
 
 
-def scad_code(piece: dict, grid: float, style: int, magnets: bool) -> str:
+def plan_parameters(values: dict) -> dict:
+    """The parsed baseplate values that determine a plan and its pieces, in canonical form."""
+    canonical = {
+        "width": values["width"],
+        "depth": values["depth"],
+        "printer_x_cells": round(values["printer_x"] / 42.0),
+        "printer_y_cells": round(values["printer_y"] / 42.0),
+        "min_margin_cells": values["min_margin_cells"],
+        "style": values["style"],
+        "magnets": values["magnets"],
+    }
+    if values["optimize"]:
+        canonical["optimize"] = {"max_margin_cells": values["max_margin_cells"]}
+    return canonical
+
+
+def logged_plan_values(values: dict) -> dict:
+    parameters = plan_parameters(values)
+    details = {key: parameters[key] for key in ("width", "depth", "printer_x_cells", "printer_y_cells", "magnets")}
+    details["optimize"] = values["optimize"]
+    return details
+
+
+def plan_id_for(values: dict) -> str:
+    return hashlib.sha256(json.dumps(plan_parameters(values), sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def bundle_cache_key(values: dict) -> str:
+    library = SOURCES.code(baseplate_preamble(PRINT_QUALITY))
+    canonical = {**plan_parameters(values), "library": library, "format": BUNDLE_FORMAT}
+    return "bundle-" + hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def parse_quality(body: dict | None = None) -> str:
+    body = request_values() if body is None else body
+    quality = str(body.get("quality", PRINT_QUALITY))
+    if quality not in QUALITY_TIERS:
+        raise ValueError("模型精度无效")
+    return quality
+
+
+def quality_prefix(quality: str) -> str:
+    """Cache key namespace of a tier; print-quality keys keep their historical names."""
+    return "" if quality == PRINT_QUALITY else f"{quality}-"
+
+
+def resolution(fa: float, fs: float, quality: str) -> str:
+    scale = QUALITY_TIERS[quality]
+    return f"$fa = {fa * scale:g};\n$fs = {fs * scale:g};"
+
+
+def baseplate_preamble(quality: str) -> str:
+    return f'''include <src/core/standard.scad>
+include <src/core/gridfinity-baseplate.scad>
+use <src/core/gridfinity-rebuilt-utility.scad>
+use <src/core/gridfinity-rebuilt-holes.scad>
+use <src/helpers/generic-helpers.scad>
+use <src/helpers/grid.scad>
+use <gridfinity-rebuilt-baseplate.scad>
+{resolution(16, 0.5, quality)}'''
+
+
+def plan_for(values: dict) -> dict:
+    """Plan the drawer of parsed baseplate ``values``, through the optimizer if requested."""
+    args = {key: values[key] for key in ("width", "depth", "printer_x", "printer_y", "grid", "min_margin_cells")}
+    if values["optimize"]:
+        return optimize_plan(**args, max_margin_cells=values["max_margin_cells"])
+    return make_plan(**args)
+
+
+def resolve_plan(body: dict | None = None) -> tuple[dict, dict]:
+    """Return ``(values, plan)`` for a request, by ``plan_id`` or from the plan parameters.
+
+    Raises ``LookupError`` if only an unknown ``plan_id`` was sent; the client then
+    asks /api/plan again, which recomputes and re-stores the same id.
+    """
+    values = resolve_plan_values(body)
+    return values, stored_plan(values)
+
+
+def resolve_plan_values(body: dict | None = None) -> dict:
+    """The plan values of a request, like ``resolve_plan`` but without computing the plan."""
+    body = request_values() if body is None else body
+    plan_id = str(body.get("plan_id", ""))
+    entry = PLAN_STORE.get(plan_id) if plan_id else None
+    if entry is not None:
+        values = entry[0]
+    elif plan_id and "width" not in body:
+        raise LookupError("预览方案已过期，请刷新预览")
+    else:
+        values = parse_payload(body)
+    g.plan_values = values
+    return values
+
+
+def stored_plan(values: dict) -> dict:
+    """The plan for ``values`` from ``PLAN_STORE``, computed and stored if missing."""
+    plan_id = plan_id_for(values)
+    entry = PLAN_STORE.get(plan_id)
+    if entry is None:
+        entry = (values, plan_for(values))
+        PLAN_STORE.put(plan_id, *entry)
+    return entry[1]
+
+
+def scad_code(piece: dict, grid: float, style: int, magnets: bool, quality: str = PRINT_QUALITY) -> str:
     fit_x, fit_y = fit_for_kind(piece["kind"])
     magnet = "true" if magnets else "false"
-    root = ROOT.as_posix()
-    return f'''include <{root}/src/core/standard.scad>
-include <{root}/src/core/gridfinity-baseplate.scad>
-use <{root}/src/core/gridfinity-rebuilt-utility.scad>
-use <{root}/src/core/gridfinity-rebuilt-holes.scad>
-use <{root}/src/helpers/generic-helpers.scad>
-use <{root}/src/helpers/grid.scad>
-use <{root}/gridfinity-rebuilt-baseplate.scad>
-$fa = 16;
-$fs = 0.5;
+    return f'''{baseplate_preamble(quality)}
 distancex = {piece['w']:.4f};
 distancey = {piece['h']:.4f};
 style_plate = {style};
@@ -159,8 +395,34 @@ gridfinityBaseplate([0, 0], {grid:.4f}, [distancex, distancey], style_plate,
 '''
 
 
-def parse_bin_payload():
-    body = request_values()
+def batch_scad_code(pieces: list[dict], grid: float, style: int, magnets: bool,
+                    quality: str = PRINT_QUALITY) -> tuple[str, list[float], list[float]]:
+    """Return SCAD placing ``pieces`` side by side along X, their X offsets and slab edges.
+
+    A piece never reaches further than its width from its own origin (the grid is
+    centred, padding goes to one side), so slab ``i`` spans ``offset ± w`` plus half
+    the gap and holds exactly that piece.
+    """
+    magnet = "true" if magnets else "false"
+    lines = [baseplate_preamble(quality), f"""style_plate = {style};
+enable_magnet = {magnet};
+hole_options = bundle_hole_options(refined_hole=false, magnet_hole=enable_magnet,
+    screw_hole=false, crush_ribs=false, chamfer_holes=true, supportless=false);"""]
+    offsets, edges = [], [-BATCH_GAP / 2]
+    for piece in pieces:
+        fit_x, fit_y = fit_for_kind(piece["kind"])
+        offset = edges[-1] + BATCH_GAP / 2 + piece["w"]
+        offsets.append(offset)
+        edges.append(offset + piece["w"] + BATCH_GAP / 2)
+        lines.append(
+            f"translate([{offset:.4f}, 0, 0]) gridfinityBaseplate([0, 0], {grid:.4f}, "
+            f"[{piece['w']:.4f}, {piece['h']:.4f}], style_plate, hole_options, 0, [{fit_x}, {fit_y}]);"
+        )
+    return "\n".join(lines) + "\n", offsets, edges
+
+
+def parse_bin_payload(body: dict | None = None):
+    body = request_values() if body is None else body
 
     def integer(name, default, minimum, maximum, label):
         try:
@@ -231,22 +493,68 @@ def parse_bin_payload():
     return params
 
 
-def bin_scad_code(params: dict) -> str:
-    root = ROOT.as_posix()
+def bin_preamble(quality: str) -> str:
+    return f'''include <src/core/standard.scad>
+use <src/core/gridfinity-rebuilt-utility.scad>
+use <src/core/gridfinity-rebuilt-holes.scad>
+use <src/core/bin.scad>
+use <src/core/cutouts.scad>
+use <src/helpers/generic-helpers.scad>
+use <src/helpers/grid.scad>
+use <src/helpers/grid_element.scad>
+use <src/helpers/shapes.scad>
+{resolution(8, 0.5, quality)}'''
+
+
+def bin_part_code(params: dict, part: str, quality: str = PRINT_QUALITY) -> str:
+    """SCAD for one cached bin subassembly; it only mentions the parameters that part depends on."""
+    boolean = lambda value: "true" if value else "false"
+    if part == "base":
+        return f'''{bin_preamble(quality)}
+hole_options = bundle_hole_options(false, {boolean(params["hole_style"] in (1, 2))}, {boolean(params["hole_style"] == 2)}, true, true, true);
+bin_render_base(new_bin(
+    grid_size = [{params['gridx']}, {params['gridy']}],
+    height_mm = BASE_HEIGHT,
+    hole_options = hole_options,
+    only_corners = {boolean(params['only_corners'])},
+    grid_dimensions = GRID_DIMENSIONS_MM
+));
+'''
+    return f'''{bin_preamble(quality)}
+d_wall = {params['wall_thickness']:.3f};
+bin_render_wall(new_bin(
+    grid_size = [{params['gridx']}, {params['gridy']}],
+    height_mm = height({params['gridz']}, 0, false),
+    include_lip = true,
+    grid_dimensions = GRID_DIMENSIONS_MM
+));
+'''
+
+
+def bin_scad_code(params: dict, quality: str = PRINT_QUALITY, parts: dict[str, Path] | None = None) -> str:
+    """SCAD for a whole bin; ``parts`` maps "base"/"wall" to cached STLs that are imported instead of rebuilt.
+
+    Parts are imported by file name, so the code must be rendered from the cache directory.
+    """
     boolean = lambda value: "true" if value else "false"
     magnet_holes = params["hole_style"] in (1, 2)
     screw_holes = params["hole_style"] == 2
-    return f'''include <{root}/src/core/standard.scad>
-use <{root}/src/core/gridfinity-rebuilt-utility.scad>
-use <{root}/src/core/gridfinity-rebuilt-holes.scad>
-use <{root}/src/core/bin.scad>
-use <{root}/src/core/cutouts.scad>
-use <{root}/src/helpers/generic-helpers.scad>
-use <{root}/src/helpers/grid.scad>
-use <{root}/src/helpers/grid_element.scad>
-use <{root}/src/helpers/shapes.scad>
-$fa = 8;
-$fs = 0.5;
+    parts = parts or {}
+    if parts:
+        # Same tree as bin_render(bin1), with the base and stacking-lip wall imported.
+        wall = f'import("{parts["wall"].name}");' if "wall" in parts else "bin_render_wall(bin1);"
+        assembly = f'''if (include_lip)
+    {wall}
+render()
+difference() {{
+    bin_render_infill(bin1);
+    translate([0, 0, BASE_HEIGHT + max(bin1[3], 0) + TOLLERANCE])
+    compartments();
+}}
+import("{parts["base"].name}");'''
+    else:
+        assembly = "bin_render(bin1) compartments();"
+    return f'''{bin_preamble(quality)}
 // wall-parameter implementation v2: values are also passed with OpenSCAD -D.
 d_wall = {params['wall_thickness']:.3f};
 d_div = {params['divider_thickness']:.3f};
@@ -284,7 +592,7 @@ module rectangle_cutter(size_mm, corner_radius) {{
             cube(size_mm + [TOLLERANCE, TOLLERANCE, TOLLERANCE], center=true);
     }}
 }}
-bin_render(bin1) {{
+module compartments() {{
     bin_subdivide(bin1, [divx, divy]) {{
         if (cut_mode == "circles")
             cut_chamfered_cylinder(cd/2, cgs().z, 0.5);
@@ -296,11 +604,12 @@ bin_render(bin1) {{
             compartment_cutter(cgs(), scoop);
     }}
 }}
+{assembly}
 '''
 
 
-def parse_pin_payload():
-    body = request_values()
+def parse_pin_payload(body: dict | None = None):
+    body = request_values() if body is None else body
 
     def number(name, default, minimum, maximum, label):
         try:
@@ -340,8 +649,8 @@ def parse_pin_payload():
     return params
 
 
-def parse_lid_payload():
-    body = request_values()
+def parse_lid_payload(body: dict | None = None):
+    body = request_values() if body is None else body
 
     def integer(name, default, minimum, maximum, label):
         try:
@@ -378,39 +687,372 @@ def parse_lid_payload():
     }
 
 
-def scad_define(value) -> str:
-    if isinstance(value, bool):
-        return "true" if value else "false"
-    if isinstance(value, str):
-        return json.dumps(value)
-    if isinstance(value, (list, tuple)):
-        return "[" + ",".join(scad_define(item) for item in value) + "]"
-    return f"{float(value):.4f}"
-
-
-def render_stl(scad_path: Path, stl_path: Path, defines: dict[str, float | bool] | None = None) -> None:
-    environment = os.environ.copy()
-    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
-    arguments = []
-    for name, value in (defines or {}).items():
-        arguments.extend(["-D", f"{name}={scad_define(value)}"])
-    arguments.extend(["-o", str(stl_path), str(scad_path)])
-
-    # Nightly uses the faster Manifold backend. OpenSCAD 2021.01 does not know
-    # this option, so retry once without it for local development compatibility.
-    attempts = ([OPENSCAD, "--backend=Manifold"], [OPENSCAD])
-    last_error = ""
-    for prefix in attempts:
-        stl_path.unlink(missing_ok=True)
-        run = subprocess.run(
-            [*prefix, *arguments],
-            cwd=ROOT, env=environment, capture_output=True, text=True, timeout=300,
-        )
-        if not run.returncode and stl_path.exists():
+def renderer_available() -> bool:
+    if RENDER_QUEUE is not None:
+        return bool(SOURCES.version())
+    return OPENSCAD_RUNNER.available()
+
+
+def render_stl(scad_path: Path, stl_path: Path, defines: dict[str, float | bool] | None = None,
+               *, generator: str) -> dict:
+    """Render ``scad_path`` to ``stl_path`` and return its profile, through ``RENDER_QUEUE`` if one is configured."""
+    if RENDER_QUEUE is None:
+        return OPENSCAD_RUNNER.render(scad_path, stl_path, defines, generator=generator)
+    # Only workers running the OpenSCAD the cache keys were made with take the task.
+    version = SOURCES.version()
+    if not version:
+        raise RuntimeError("没有可用的渲染节点，请稍后重试")
+    task_id = RENDER_QUEUE.submit({
+        "scad": store_name(scad_path, STORE_BASES), "output": store_name(stl_path, STORE_BASES),
+        "defines": defines or {}, "generator": generator, "openscad_version": version,
+    })
+    result = RENDER_QUEUE.wait(task_id, RENDER_QUEUE_TIMEOUT)
+    if result is None:
+        RENDER_QUEUE.cancel(task_id)
+        OPENSCAD_FAILURES.inc(generator=generator, reason="queue_timeout")
+        raise RuntimeError("渲染队列繁忙，请稍后重试")
+    if result["state"] != "done" or not stl_path.exists():
+        app.logger.error("Render task %s failed: %s", task_id, result.get("error"))
+        raise RuntimeError("STL 生成失败，请稍后重试")
+    RENDER_SECONDS.observe(result["profile"]["wall_seconds"], generator=generator)
+    return result["profile"]
+
+
+def cached_render(cache_key: str, render: Callable[[Path], dict | None], compress: bool = True,
+                  parameters: dict | None = None) -> Path:
+    """Return the cached STL for ``cache_key``, calling ``render(target)`` through the scheduler if it is missing.
+
+    Cache hits are served without touching the scheduler. New files are written
+    next to the cache entry and renamed into place, so readers never see a partial STL.
+    A render profile returned by ``render`` is kept in the sidecar with ``parameters``.
+    """
+    stl_path = STL_CACHE.path(cache_key)
+    if STL_CACHE.hit(cache_key):
+        CACHE_LOOKUPS.inc(generator=generator_for(cache_key), result="hit")
+        return stl_path
+    CACHE_LOOKUPS.inc(generator=generator_for(cache_key), result="miss")
+
+    def fill() -> Path:
+        if not stl_path.exists():
+            fill_cache(cache_key, render, compress, parameters)
+        return stl_path
+
+    return RENDER_SCHEDULER.run(cache_key, fill)
+
+
+def fill_cache(cache_key: str, render: Callable[[Path], dict | None], compress: bool = True,
+               parameters: dict | None = None) -> Path:
+    """Render ``cache_key`` into the cache right away (``cached_render`` without the lookup and the scheduler).
+
+    For inputs of a render that already holds a scheduler slot and found them evicted.
+    """
+    stl_path = STL_CACHE.path(cache_key)
+    # Per thread, since callers outside the scheduler may fill the same key concurrently.
+    target = STL_CACHE.path(cache_key, f".{os.getpid()}-{threading.get_ident()}.partial.stl")
+    try:
+        profile = render(target)
+        os.replace(target, stl_path)
+    finally:
+        target.unlink(missing_ok=True)
+    if profile:
+        STL_CACHE.write_meta(cache_key, profile={**profile, "parameters": parameters or {}})
+    if compress:
+        compressed_meta(cache_key)
+    else:
+        STL_CACHE.add(cache_key)
+    return stl_path
+
+
+def compressed_meta(cache_key: str) -> dict:
+    """Return the sidecar of an STL after making sure its compressed copies exist.
+
+    ``meta["deflate"]`` holds the CRC32, Adler-32 and sizes of the raw deflate copy;
+    ``meta["brotli"]`` is only present when the optional brotli module is installed.
+    """
+    meta = STL_CACHE.read_meta(cache_key)
+    stl_path = STL_CACHE.path(cache_key)
+    changed = False
+    if "deflate" not in meta or not STL_CACHE.path(cache_key, ".stl.deflate").exists():
+        meta["deflate"] = deflate_file(stl_path, STL_CACHE.path(cache_key, ".stl.deflate"))
+        changed = True
+    if brotli is not None and ("brotli" not in meta or not STL_CACHE.path(cache_key, ".stl.br").exists()):
+        meta["brotli"] = brotli_file(stl_path, STL_CACHE.path(cache_key, ".stl.br"))
+        changed = True
+    if changed:
+        meta = STL_CACHE.write_meta(cache_key, **meta)
+        STL_CACHE.add(cache_key)
+    return meta
+
+
+def send_stl(stl_path: Path, download_name: str, as_attachment: bool) -> Response:
+    """Send a cached STL, as stored brotli/gzip/deflate bytes when the client accepts them."""
+    cache_key = stl_path.stem
+    meta = compressed_meta(cache_key)
+    available = [name for name, (_, section, _, _) in ENCODINGS.items() if section in meta]
+    encoding = request.accept_encodings.best_match(available)
+    if encoding is None:
+        response = send_file(stl_path, mimetype="model/stl", as_attachment=as_attachment, download_name=download_name)
+    else:
+        suffix, section, stream, overhead = ENCODINGS[encoding]
+        response = Response(stream(STL_CACHE.path(cache_key, suffix), meta[section]), mimetype="model/stl")
+        response.content_length = meta[section][f"{section}_size"] + overhead
+        response.headers["Content-Encoding"] = encoding
+        disposition = "attachment" if as_attachment else "inline"
+        response.headers["Content-Disposition"] = f'{disposition}; filename="{download_name}"'
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    response.headers["X-Stl-Url"] = stl_url(cache_key)
+    return response
+
+
+def generator_for(cache_key: str) -> str:
+    """Metric label of the generator a cache key belongs to."""
+    prefix = entry_prefix(cache_key)
+    return prefix.rstrip("-") if prefix != PIECE_PREFIX else "piece"
+
+
+def stl_url(cache_key: str) -> str:
+    """Immutable URL of a cached STL; keys are hashes of everything that shapes the mesh."""
+    return f"/stl/{cache_key}.stl"
+
+
+def code_hash(code: str) -> str:
+    """Hash of generated SCAD together with the fingerprint of the library files it includes."""
+    return hashlib.sha256(f"{SOURCES.code(code)}\0{code}".encode("utf-8")).hexdigest()
+
+
+def piece_cache_key(piece: dict, grid: float, style: int, magnets: bool,
+                    quality: str = PRINT_QUALITY) -> tuple[str, str]:
+    code = scad_code(piece, grid, style, magnets, quality)
+    cache_key = quality_prefix(quality) + code_hash(code)
+    if tile_template(piece, grid) is not None:
+        # Tiled meshes are not byte-identical to a render of the same code.
+        cache_key += f"-tiled{TILE_FORMAT}"
+    return code, cache_key
+
+
+def tile_template(piece: dict, grid: float) -> tuple[dict, tuple[int, int], tuple[int, int]] | None:
+    """Return ``(template piece, template cells, piece cells)`` if ``piece`` can be tiled."""
+    if not TILE_CENTER or piece["kind"] != "center":
+        return None
+    cells = (round(piece["w"] / grid), round(piece["h"] / grid))
+    if abs(piece["w"] - cells[0] * grid) > 1e-6 or abs(piece["h"] - cells[1] * grid) > 1e-6:
+        return None
+    template_cells = (min(cells[0], 3), min(cells[1], 3))
+    if template_cells == cells:
+        return None
+    template = {"w": template_cells[0] * grid, "h": template_cells[1] * grid, "kind": "center"}
+    return template, template_cells, cells
+
+
+def render_batch(pieces: list[dict], grid: float, style: int, magnets: bool, quality: str = PRINT_QUALITY) -> None:
+    """Render several canonical pieces in one OpenSCAD run and file each into the piece cache."""
+    renders = [(piece, *piece_cache_key(piece, grid, style, magnets, quality)) for piece in pieces]
+    batch_key = "batch-" + hashlib.sha256("\0".join(key for _, _, key in renders).encode("utf-8")).hexdigest()
+
+    def fill() -> None:
+        pending = [item for item in renders if not STL_CACHE.path(item[2]).exists()]
+        if not pending:
+            return
+        code, offsets, edges = batch_scad_code([piece for piece, _, _ in pending], grid, style, magnets, quality)
+        scad_path = STL_CACHE.path(batch_key, f".{os.getpid()}.partial.scad")
+        stl_path = STL_CACHE.path(batch_key, f".{os.getpid()}.partial.stl")
+        try:
+            scad_path.write_text(code, encoding="utf-8")
+            profile = render_stl(scad_path, stl_path, generator="piece")
+            parts = split_by_x(read_stl(stl_path), edges)
+            if not all(len(part) for part in parts):
+                raise RuntimeError("STL 生成失败，请稍后重试")
+            for (piece, piece_code, cache_key), part, offset in zip(pending, parts, offsets):
+                target = STL_CACHE.path(cache_key, f".{os.getpid()}.partial.stl")
+                try:
+                    write_stl(target, part - (offset, 0.0, 0.0))
+                    STL_CACHE.path(cache_key, ".scad").write_text(piece_code, encoding="utf-8")
+                    os.replace(target, STL_CACHE.path(cache_key))
+                finally:
+                    target.unlink(missing_ok=True)
+                parameters = piece_parameters(piece, grid, style, magnets, quality)
+                STL_CACHE.write_meta(cache_key, profile={**profile, "batch_size": len(pending), "parameters": parameters})
+                compressed_meta(cache_key)
+        finally:
+            scad_path.unlink(missing_ok=True)
+            stl_path.unlink(missing_ok=True)
+
+    RENDER_SCHEDULER.run(batch_key, fill)
+
+
+def render_pieces(pieces: list[dict], grid: float, style: int, magnets: bool,
+                  quality: str = PRINT_QUALITY) -> list[Future]:
+    """Submit the renders of a whole plan to ``RENDER_POOL`` and return one future per piece.
+
+    Uncached canonical pieces are grouped so that every worker gets one OpenSCAD run
+    of at most ``BATCH_SIZE`` pieces. A failed batch falls back to per-piece renders.
+    """
+    pending: dict[str, dict] = {}
+    for piece in pieces:
+        canonical, _ = canonical_piece(piece)
+        tiling = tile_template(canonical, grid)
+        if tiling is not None:
+            canonical, _ = canonical_piece(tiling[0])
+        _, cache_key = piece_cache_key(canonical, grid, style, magnets, quality)
+        if cache_key not in pending and not STL_CACHE.path(cache_key).exists():
+            pending[cache_key] = canonical
+    # At least 1: with every piece cached there is nothing to batch, but range() needs a step.
+    size = max(1, min(BATCH_SIZE, -(-len(pending) // RENDER_WORKERS)))
+    keys = list(pending)
+    batches: dict[str, Future] = {}
+    for start in range(0, len(keys) if size > 1 else 0, size):
+        chunk = keys[start:start + size]
+        if len(chunk) > 1:
+            batch = RENDER_POOL.submit(render_batch, [pending[key] for key in chunk], grid, style, magnets, quality)
+            batches.update(dict.fromkeys(chunk, batch))
+
+    def render(piece: dict) -> Path:
+        canonical, _ = canonical_piece(piece)
+        tiling = tile_template(canonical, grid)
+        if tiling is not None:
+            canonical, _ = canonical_piece(tiling[0])
+        _, cache_key = piece_cache_key(canonical, grid, style, magnets, quality)
+        batch = batches.get(cache_key)
+        if batch is not None:
+            try:
+                batch.result()
+            except (RuntimeError, OSError, ValueError, subprocess.TimeoutExpired):
+                app.logger.warning("Batch render failed, rendering piece %s on its own", piece.get("pid"))
+        return render_piece(piece, grid, style, magnets, quality)
+
+    # Batches were queued first, so a worker waiting on one never blocks it from starting.
+    return [RENDER_POOL.submit(render, piece) for piece in pieces]
+
+
+def render_piece(piece: dict, grid: float, style: int, magnets: bool, quality: str = PRINT_QUALITY) -> Path:
+    """Return the cached STL of a baseplate piece.
+
+    Only the canonical piece of each mirror/rotation class is rendered by OpenSCAD;
+    the other members are derived from its mesh by a vertex transform. Large center
+    pieces are tiled from the cells of a cached piece of at most 3x3 cells.
+    """
+    canonical, symmetry = canonical_piece(piece)
+    code, cache_key = piece_cache_key(canonical, grid, style, magnets, quality)
+    scad_path = STL_CACHE.path(cache_key, ".scad")
+    tiling = tile_template(canonical, grid)
+    template_path = None
+    if tiling is not None and not STL_CACHE.path(cache_key).exists():
+        # Resolved before entering the scheduler, which must not be re-entered from a render.
+        template_path = render_piece(tiling[0], grid, style, magnets, quality)
+
+    def render(target: Path) -> None:
+        if template_path is not None and template_path.exists():
+            _, template_cells, cells = tiling
+            write_stl(target, tile_cells(read_stl(template_path), template_cells, cells, grid))
             return
-        last_error = run.stderr
-    app.logger.error("OpenSCAD failed: %s", last_error[-2000:])
-    raise RuntimeError("STL 生成失败，请稍后重试")
+        # Without a template (evicted, or a re-render from derive) OpenSCAD renders the piece itself.
+        scad_path.write_text(code, encoding="utf-8")
+        return render_stl(scad_path, target, generator="piece")
+
+    parameters = piece_parameters(canonical, grid, style, magnets, quality)
+    canonical_path = cached_render(cache_key, render, parameters=parameters)
+    if symmetry == "identity":
+        return canonical_path
+
+    def derive(target: Path) -> None:
+        if not canonical_path.exists():
+            # Evicted since it was resolved; rendered here directly, as this render already holds a scheduler slot.
+            fill_cache(cache_key, render, parameters=parameters)
+        write_stl(target, transform_xy(read_stl(canonical_path), SYMMETRIES[symmetry]))
+
+    return cached_render(piece_stl_key(piece, grid, style, magnets, quality), derive)
+
+
+def piece_parameters(piece: dict, grid: float, style: int, magnets: bool, quality: str) -> dict:
+    """Parameters recorded with the render profile of a canonical piece."""
+    return {"w": piece["w"], "h": piece["h"], "kind": piece["kind"], "grid": grid,
+            "style": style, "magnets": magnets, "quality": quality}
+
+
+def piece_stl_key(piece: dict, grid: float, style: int, magnets: bool, quality: str = PRINT_QUALITY) -> str:
+    """Cache key of the STL ``render_piece`` returns for ``piece``."""
+    canonical, symmetry = canonical_piece(piece)
+    _, cache_key = piece_cache_key(canonical, grid, style, magnets, quality)
+    return cache_key if symmetry == "identity" else f"{cache_key}-{symmetry}"
+
+
+def bin_part_render(params: dict, part: str, quality: str = PRINT_QUALITY) -> tuple[str, Callable[[Path], dict]]:
+    """Cache key and render function of a bin subassembly ("base" or "wall")."""
+    code = bin_part_code(params, part, quality)
+    cache_key = f"bin-{quality_prefix(quality)}{part}-" + code_hash(code)
+    scad_path = STL_CACHE.path(cache_key, ".scad")
+    defines = {"d_wall": params["wall_thickness"]} if part == "wall" else None
+
+    def render(target: Path) -> dict:
+        scad_path.write_text(code, encoding="utf-8")
+        return render_stl(scad_path, target, defines, generator="bin")
+
+    return cache_key, render
+
+
+def render_bin_part(params: dict, part: str, quality: str = PRINT_QUALITY) -> Path:
+    """Return the cached STL of a bin subassembly ("base" or "wall")."""
+    cache_key, render = bin_part_render(params, part, quality)
+    # Parts are only ever imported by OpenSCAD, never sent to clients.
+    return cached_render(cache_key, render, compress=False, parameters={**params, "part": part, "quality": quality})
+
+
+def render_bin(params: dict, quality: str = PRINT_QUALITY) -> Path:
+    """Return the cached STL of a bin.
+
+    The base and the stacking-lip wall are cached on their own and imported, so a
+    new bin only evaluates its infill and compartment cutters.
+    """
+    parts = {"base": render_bin_part(params, "base", quality)}
+    if params["include_lip"]:
+        parts["wall"] = render_bin_part(params, "wall", quality)
+    code = bin_scad_code(params, quality, parts)
+    cache_key = "bin-" + quality_prefix(quality) + code_hash(code)
+    scad_path = STL_CACHE.path(cache_key, ".scad")
+
+    def render(target: Path) -> None:
+        for part, path in parts.items():
+            if not path.exists():
+                # Evicted since it was resolved (import() would silently skip it). Rendered
+                # here directly, as this render already holds a scheduler slot.
+                part_key, render_part = bin_part_render(params, part, quality)
+                fill_cache(part_key, render_part, compress=False, parameters={**params, "part": part, "quality": quality})
+        scad_path.write_text(code, encoding="utf-8")
+        return render_stl(scad_path, target, {
+            "d_wall": params["wall_thickness"],
+            "d_div": params["divider_thickness"],
+        }, generator="bin")
+
+    return cached_render(cache_key, render, parameters={**params, "quality": quality})
+
+
+def render_pin(params: dict) -> Path:
+    cache_input = json.dumps({"source": SOURCES.files([PIN_SCAD_PATH]), "params": params}, sort_keys=True)
+    cache_key = "pin-" + hashlib.sha256(cache_input.encode("utf-8")).hexdigest()
+    return cached_render(
+        cache_key, lambda target: render_stl(PIN_SCAD_PATH, target, params, generator="pin"), parameters=params,
+    )
+
+
+def lid_defines(params: dict) -> dict:
+    """OpenSCAD -D values that select a lid in ``LID_SCAD_PATH``."""
+    return {
+        "width": [params["gridx"], 0],
+        "depth": [params["gridy"], 0],
+        "Lid_Options": params["lid_style"],
+        "Enable_Magnets": params["magnets"],
+        "Lid_Include_Magnets": params["magnets"],
+    }
+
+
+def render_lid(params: dict) -> Path:
+    defines = lid_defines(params)
+    cache_input = json.dumps({"source": SOURCES.files([LID_SCAD_PATH]), "defines": defines}, sort_keys=True)
+    cache_key = "lid-" + hashlib.sha256(cache_input.encode("utf-8")).hexdigest()
+    return cached_render(
+        cache_key, lambda target: render_stl(LID_SCAD_PATH, target, defines, generator="lid"), parameters=params,
+    )
 
 
 @app.get("/")
@@ -450,88 +1092,186 @@ def browser_action():
 
 @app.post("/api/plan")
 def plan():
+    """Plan a drawer and return it with its ``plan_id`` and the cache state of each piece."""
+    try:
+        values, result = resolve_plan()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except LookupError as exc:
+        return jsonify({"error": str(exc), "expired": True}), 410
+    pieces = []
+    for piece in result["pieces"]:
+        cache_key = piece_stl_key(piece, values["grid"], values["style"], values["magnets"])
+        pieces.append({
+            **piece, "cache_key": cache_key, "cached": STL_CACHE.path(cache_key).exists(), "stl_url": stl_url(cache_key),
+        })
+    return jsonify({**result, "plan_id": plan_id_for(values), "pieces": pieces})
+
+
+def parse_plan_batch_payload(body: dict | None = None):
+    body = request_values() if body is None else body
+
+    def values(name, default, minimum, maximum, label, integer=False):
+        raw = body.get(name, default)
+        if isinstance(raw, str):
+            raw = raw.split(",")
+        items = raw if isinstance(raw, list) else [raw]
+        if not items:
+            raise ValueError(f"{label}至少需要一个取值")
+        try:
+            numbers = [float(item) for item in items]
+        except (TypeError, ValueError):
+            raise ValueError(f"{label}请输入有效的数字")
+        for number in numbers:
+            if not minimum <= number <= maximum:
+                raise ValueError(f"{label}需要在 {minimum:g} 到 {maximum:g} 之间")
+            if integer and abs(number - round(number)) > 1e-8:
+                raise ValueError(f"{label}必须是整数")
+        return sorted({round(number) if integer else number for number in numbers})
+
+    params = {
+        "widths": values("widths", [413], 1e-3, 3000, "抽屉宽度"),
+        "depths": values("depths", [308], 1e-3, 3000, "抽屉深度"),
+        "printer_x_cells": values("printer_x_cells", [3], 1, 71, "打印机 X 最大格数", integer=True),
+        "printer_y_cells": values("printer_y_cells", [3], 1, 71, "打印机 Y 最大格数", integer=True),
+        "margin_cells": values("min_margin_cells", [1], 0, 10, "边缘格数", integer=True),
+    }
+    if math.prod(len(items) for items in params.values()) > PLAN_BATCH_MAX_ROWS:
+        raise ValueError(f"组合数量过多，最多 {PLAN_BATCH_MAX_ROWS} 个")
+    return params
+
+
+@app.post("/api/plan/batch")
+def plan_batch():
+    """Plan every combination of the given drawer, printer and margin values as one table."""
     try:
-        values = parse_payload()
-        result = make_plan(**{key: values[key] for key in (
-            "width", "depth", "printer_x", "printer_y", "grid", "min_margin_cells"
-        )})
-        return jsonify(result)
+        params = parse_plan_batch_payload()
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
+    return jsonify(plan_table(**params, grid=42.0))
+
 
+def bundle_filename(values: dict) -> str:
+    return f"gridfinity_{values['width']:g}x{values['depth']:g}mm.zip"
+
+
+def bundle_entries(values: dict, plan_data: dict, futures: list[Future]):
+    """ZIP entries of a plan bundle; pieces are spliced in plan order as each render finishes."""
+    yield bytes_entry("assembly_plan.json", json.dumps(plan_data, ensure_ascii=False, indent=2).encode("utf-8"))
+    yield bytes_entry("使用说明.txt", "文件编号对应网页预览中的编号。单位：毫米。打印前请在切片软件中复核尺寸。\n".encode("utf-8"))
+    for piece, future in zip(plan_data["pieces"], futures):
+        cache_key = future.result().stem
+
+        def restore(piece: dict = piece, cache_key: str = cache_key) -> dict:
+            # The cache GC may evict a piece (or only its deflate copy) while the bundle streams.
+            render_piece(piece, values["grid"], values["style"], values["magnets"])
+            return compressed_meta(cache_key)
+
+        try:
+            meta = compressed_meta(cache_key)
+        except OSError:
+            meta = restore()
+        yield precompressed_entry(
+            f"{piece['pid']:02d}_{piece['w']:g}x{piece['h']:g}mm.stl",
+            STL_CACHE.path(cache_key, ".stl.deflate"), meta["deflate"], restore,
+        )
 
-@app.post("/api/download")
+
+@app.route("/api/download", methods=["GET", "POST"])
 def download():
     try:
-        values = parse_payload()
-        plan_data = make_plan(**{key: values[key] for key in (
-            "width", "depth", "printer_x", "printer_y", "grid", "min_margin_cells"
-        )})
+        # Only the values: a cached bundle is served without computing the plan.
+        values = resolve_plan_values()
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
-    if not Path(OPENSCAD).exists():
-        return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
+    except LookupError as exc:
+        return jsonify({"error": str(exc), "expired": True}), 410
+    filename = bundle_filename(values)
+    bundle_key = bundle_cache_key(values)
+    bundle_path = STL_CACHE.path(bundle_key, ".zip")
+    bundle_hit = STL_CACHE.hit(bundle_key)
+    CACHE_LOOKUPS.inc(generator="bundle", result="hit" if bundle_hit else "miss")
+    if bundle_hit:
+        # Finished bundles are plain files: zero-copy, ETag and Range (resume) for free.
+        response = send_file(
+            bundle_path, mimetype="application/zip", as_attachment=True, download_name=filename,
+            conditional=True, etag=bundle_key,
+        )
+        response.headers["Cache-Control"] = "private, max-age=3600"
+        return response
 
-    archive = io.BytesIO()
     try:
-        with RENDER_LOCK, tempfile.TemporaryDirectory(prefix="gridfinity-") as temp_name:
-            temp = Path(temp_name)
-            for piece in plan_data["pieces"]:
-                stem = f"{piece['pid']:02d}_{piece['w']:g}x{piece['h']:g}mm"
-                scad_path = temp / f"{stem}.scad"
-                stl_path = temp / f"{stem}.stl"
-                scad_path.write_text(scad_code(piece, values["grid"], values["style"], values["magnets"]), encoding="utf-8")
-                render_stl(scad_path, stl_path)
-
-            with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as bundle:
-                bundle.writestr("assembly_plan.json", json.dumps(plan_data, ensure_ascii=False, indent=2))
-                bundle.writestr("使用说明.txt", "文件编号对应网页预览中的编号。单位：毫米。打印前请在切片软件中复核尺寸。\n")
-                for stl_path in sorted(temp.glob("*.stl")):
-                    bundle.write(stl_path, stl_path.name)
-    except (RuntimeError, subprocess.TimeoutExpired) as exc:
-        return jsonify({"error": str(exc)}), 500
-    archive.seek(0)
-    filename = f"gridfinity_{values['width']:g}x{values['depth']:g}mm.zip"
-    return send_file(archive, mimetype="application/zip", as_attachment=True, download_name=filename)
+        plan_data = stored_plan(values)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if not renderer_available():
+        return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
+
+    futures = render_pieces(plan_data["pieces"], values["grid"], values["style"], values["magnets"])
+
+    def generate():
+        # The first stream of a bundle is also written to the cache; concurrent
+        # first requests just stream.
+        with BUNDLE_WRITERS_LOCK:
+            tee = bundle_key not in BUNDLE_WRITERS
+            BUNDLE_WRITERS.add(bundle_key)
+        partial = STL_CACHE.path(bundle_key, f".{os.getpid()}.partial.zip")
+        writer = partial.open("wb") if tee else None
+        try:
+            for chunk in stream_zip(bundle_entries(values, plan_data, futures)):
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+            if writer:
+                writer.close()
+                os.replace(partial, bundle_path)
+                STL_CACHE.add(bundle_key)
+        except (RuntimeError, subprocess.TimeoutExpired):
+            # Headers are already sent, so the only way to report the failure is to
+            # abort the transfer; the client sees a truncated, invalid archive.
+            app.logger.exception("ZIP download aborted")
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+            if writer:
+                writer.close()
+                partial.unlink(missing_ok=True)
+                with BUNDLE_WRITERS_LOCK:
+                    BUNDLE_WRITERS.discard(bundle_key)
+
+    response = Response(stream_with_context(generate()), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
 
 @app.route("/api/piece-stl", methods=["GET", "POST"])
 def piece_stl():
     try:
-        values = parse_payload()
         body = request_values()
+        values, plan_data = resolve_plan(body)
         piece_id = int(body.get("piece_id", 0))
         as_download = str(body.get("download", "0")).lower() in ("1", "true", "yes", "on")
-        plan_data = make_plan(**{key: values[key] for key in (
-            "width", "depth", "printer_x", "printer_y", "grid", "min_margin_cells"
-        )})
+        quality = PRINT_QUALITY if as_download else parse_quality(body)
         if piece_id < 1 or piece_id > len(plan_data["pieces"]):
             raise ValueError("请选择有效的底板编号")
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
-    if not Path(OPENSCAD).exists():
+    except LookupError as exc:
+        return jsonify({"error": str(exc), "expired": True}), 410
+    if not renderer_available():
         return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
 
     piece = plan_data["pieces"][piece_id - 1]
-    code = scad_code(piece, values["grid"], values["style"], values["magnets"])
-    cache_key = hashlib.sha256(code.encode("utf-8")).hexdigest()
-    scad_path = CACHE_DIR / f"{cache_key}.scad"
-    stl_path = CACHE_DIR / f"{cache_key}.stl"
     try:
-        with RENDER_LOCK:
-            if not stl_path.exists():
-                scad_path.write_text(code, encoding="utf-8")
-                render_stl(scad_path, stl_path)
+        stl_path = render_piece(piece, values["grid"], values["style"], values["magnets"], quality)
     except (RuntimeError, subprocess.TimeoutExpired) as exc:
         return jsonify({"error": str(exc)}), 500
 
-    response = send_file(
-        stl_path, mimetype="model/stl", as_attachment=as_download,
-        download_name=f"{piece_id:02d}_{piece['w']:g}x{piece['h']:g}mm.stl",
-    )
-    response.headers["Cache-Control"] = "private, max-age=3600"
+    response = send_stl(stl_path, f"{piece_id:02d}_{piece['w']:g}x{piece['h']:g}mm.stl", as_download)
     response.headers["X-Piece-Width"] = str(piece["w"])
     response.headers["X-Piece-Height"] = str(piece["h"])
+    response.headers["X-Quality"] = quality
     return response
 
 
@@ -541,31 +1281,22 @@ def bin_stl():
         params = parse_bin_payload()
         body = request_values()
         as_download = str(body.get("download", "0")).lower() in ("1", "true", "yes", "on")
+        quality = PRINT_QUALITY if as_download else parse_quality(body)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
-    if not Path(OPENSCAD).exists():
+    if not renderer_available():
         return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
 
-    code = bin_scad_code(params)
-    cache_key = hashlib.sha256(code.encode("utf-8")).hexdigest()
-    scad_path = CACHE_DIR / f"bin-{cache_key}.scad"
-    stl_path = CACHE_DIR / f"bin-{cache_key}.stl"
     try:
-        with RENDER_LOCK:
-            if not stl_path.exists():
-                scad_path.write_text(code, encoding="utf-8")
-                render_stl(scad_path, stl_path, {
-                    "d_wall": params["wall_thickness"],
-                    "d_div": params["divider_thickness"],
-                })
+        stl_path = render_bin(params, quality)
     except (RuntimeError, subprocess.TimeoutExpired) as exc:
         return jsonify({"error": str(exc)}), 500
 
     suffix = {"compartments": "divided", "circles": "circle_array", "rectangles": "rect_array"}[params["cut_mode"]]
     filename = f"gridfinity_{suffix}_{params['gridx']}x{params['gridy']}x{params['gridz']}U.stl"
-    response = send_file(stl_path, mimetype="model/stl", as_attachment=as_download, download_name=filename)
-    response.headers["Cache-Control"] = "private, max-age=3600"
+    response = send_stl(stl_path, filename, as_download)
     response.headers["X-Bin-Grid"] = f"{params['gridx']}x{params['gridy']}x{params['gridz']}"
+    response.headers["X-Quality"] = quality
     return response
 
 
@@ -577,19 +1308,13 @@ def pin_stl():
         as_download = str(body.get("download", "0")).lower() in ("1", "true", "yes", "on")
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
-    if not Path(OPENSCAD).exists():
+    if not renderer_available():
         return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
     if not PIN_SCAD_PATH.exists():
         return jsonify({"error": "服务器缺少插销 SCAD 源文件"}), 503
 
-    source_hash = hashlib.sha256(PIN_SCAD_PATH.read_bytes()).hexdigest()
-    cache_input = json.dumps({"source": source_hash, "params": params}, sort_keys=True)
-    cache_key = hashlib.sha256(cache_input.encode("utf-8")).hexdigest()
-    stl_path = CACHE_DIR / f"pin-{cache_key}.stl"
     try:
-        with RENDER_LOCK:
-            if not stl_path.exists():
-                render_stl(PIN_SCAD_PATH, stl_path, params)
+        stl_path = render_pin(params)
     except (RuntimeError, subprocess.TimeoutExpired) as exc:
         return jsonify({"error": str(exc)}), 500
 
@@ -597,8 +1322,7 @@ def pin_stl():
     filename = (
         f"gridfinity_snap_pin_w{maximum_width:.2f}_center{params['target_center_length']:.2f}.stl"
     )
-    response = send_file(stl_path, mimetype="model/stl", as_attachment=as_download, download_name=filename)
-    response.headers["Cache-Control"] = "private, max-age=3600"
+    response = send_stl(stl_path, filename, as_download)
     response.headers["X-Pin-Max-Width"] = f"{maximum_width:.3f}"
     response.headers["X-Pin-Center-Length"] = f"{params['target_center_length']:.3f}"
     return response
@@ -612,39 +1336,254 @@ def lid_stl():
         as_download = str(body.get("download", "0")).lower() in ("1", "true", "yes", "on")
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
-    if not Path(OPENSCAD).exists():
+    if not renderer_available():
         return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
     if not LID_SCAD_PATH.exists():
         return jsonify({"error": "服务器缺少 Gridfinity Extended 盖子源文件"}), 503
 
-    defines = {
-        "width": [params["gridx"], 0],
-        "depth": [params["gridy"], 0],
-        "Lid_Options": params["lid_style"],
-        "Enable_Magnets": params["magnets"],
-        "Lid_Include_Magnets": params["magnets"],
-    }
-    source_hash = hashlib.sha256(LID_SCAD_PATH.read_bytes()).hexdigest()
-    cache_input = json.dumps({"source": source_hash, "defines": defines}, sort_keys=True)
-    cache_key = hashlib.sha256(cache_input.encode("utf-8")).hexdigest()
-    stl_path = CACHE_DIR / f"lid-{cache_key}.stl"
     try:
-        with RENDER_LOCK:
-            if not stl_path.exists():
-                render_stl(LID_SCAD_PATH, stl_path, defines)
+        stl_path = render_lid(params)
     except (RuntimeError, subprocess.TimeoutExpired) as exc:
         return jsonify({"error": str(exc)}), 500
 
     kind = "magnetic" if params["magnets"] else "dust"
     filename = f"gridfinity_{kind}_lid_{params['gridx']}x{params['gridy']}.stl"
-    response = send_file(stl_path, mimetype="model/stl", as_attachment=as_download, download_name=filename)
-    response.headers["Cache-Control"] = "private, max-age=3600"
+    response = send_stl(stl_path, filename, as_download)
     response.headers["X-Lid-Grid"] = f"{params['gridx']}x{params['gridy']}"
     response.headers["X-Lid-Style"] = params["lid_style"]
     response.headers["X-Lid-Magnets"] = "true" if params["magnets"] else "false"
     return response
 
 
+def job_view(job: dict) -> dict:
+    """Public JSON of a job."""
+    view = {key: job[key] for key in ("id", "kind", "state", "stage", "done", "total", "error", "created", "updated")}
+    view["status_url"] = f"/api/jobs/{job['id']}"
+    if job["state"] == "done":
+        view["artifact_url"] = f"/api/jobs/{job['id']}/artifact"
+        view["filename"] = job["artifact"]["filename"]
+    return view
+
+
+def write_bundle(job_id: str, values: dict, plan_data: dict) -> dict:
+    """Render a plan and store its ZIP bundle in the cache, reporting progress per piece."""
+    bundle_key = bundle_cache_key(values)
+    artifact = {"cache_key": bundle_key, "filename": bundle_filename(values), "mimetype": "application/zip"}
+    bundle_hit = STL_CACHE.hit(bundle_key)
+    CACHE_LOOKUPS.inc(generator="bundle", result="hit" if bundle_hit else "miss")
+    if bundle_hit:
+        return artifact
+    futures = render_pieces(plan_data["pieces"], values["grid"], values["style"], values["magnets"])
+    for future in futures:
+        future.add_done_callback(lambda _: JOBS.advance(job_id))
+    partial = STL_CACHE.path(bundle_key, f".{os.getpid()}.{job_id}.partial.zip")
+    try:
+        with partial.open("wb") as writer:
+            for chunk in stream_zip(bundle_entries(values, plan_data, futures)):
+                writer.write(chunk)
+        os.replace(partial, STL_CACHE.path(bundle_key, ".zip"))
+        STL_CACHE.add(bundle_key)
+    finally:
+        for future in futures:
+            future.cancel()
+        partial.unlink(missing_ok=True)
+    return artifact
+
+
+def write_bin(job_id: str, params: dict) -> dict:
+    """Render a bin part by part, reporting each finished part."""
+    JOBS.update(job_id, stage="base")
+    render_bin_part(params, "base")
+    JOBS.advance(job_id)
+    if params["include_lip"]:
+        JOBS.update(job_id, stage="wall")
+        render_bin_part(params, "wall")
+        JOBS.advance(job_id)
+    JOBS.update(job_id, stage="bin")
+    suffix = {"compartments": "divided", "circles": "circle_array", "rectangles": "rect_array"}[params["cut_mode"]]
+    filename = f"gridfinity_{suffix}_{params['gridx']}x{params['gridy']}x{params['gridz']}U.stl"
+    return {"cache_key": render_bin(params).stem, "filename": filename, "mimetype": "model/stl"}
+
+
+def write_pin(job_id: str, params: dict) -> dict:
+    maximum_width = params["head_diameter"] + 2 * params["snap_projection"] - params["fit_clearance"]
+    filename = f"gridfinity_snap_pin_w{maximum_width:.2f}_center{params['target_center_length']:.2f}.stl"
+    return {"cache_key": render_pin(params).stem, "filename": filename, "mimetype": "model/stl"}
+
+
+def write_lid(job_id: str, params: dict) -> dict:
+    kind = "magnetic" if params["magnets"] else "dust"
+    filename = f"gridfinity_{kind}_lid_{params['gridx']}x{params['gridy']}.stl"
+    return {"cache_key": render_lid(params).stem, "filename": filename, "mimetype": "model/stl"}
+
+
+def run_job(job_id: str, write: Callable[..., dict], *args) -> None:
+    JOBS.update(job_id, state="running", stage="rendering")
+    try:
+        artifact = write(job_id, *args)
+    except (RuntimeError, subprocess.TimeoutExpired) as exc:
+        app.logger.warning("Job %s failed: %s", job_id, exc)
+        JOBS.update(job_id, state="failed", stage="failed", error=str(exc) or "STL 生成失败，请稍后重试")
+    except Exception:
+        app.logger.exception("Job %s failed", job_id)
+        JOBS.update(job_id, state="failed", stage="failed", error="STL 生成失败，请稍后重试")
+    else:
+        job = JOBS.get(job_id)
+        JOBS.update(job_id, state="done", stage="done", done=job["total"] if job else 0, artifact=artifact)
+
+
+@app.post("/api/jobs")
+def create_job():
+    """Start a bundle, bin, pin or lid render in the background and return its job id at once."""
+    body = request_values()
+    kind = str(body.get("kind", ""))
+    try:
+        if kind == "bundle":
+            values, plan_data = resolve_plan(body)
+            g.plan_values = values
+            work, args, total = write_bundle, (values, plan_data), len(plan_data["pieces"])
+        elif kind == "bin":
+            params = parse_bin_payload(body)
+            work, args, total = write_bin, (params,), 3 if params["include_lip"] else 2
+        elif kind == "pin":
+            work, args, total = write_pin, (parse_pin_payload(body),), 1
+        elif kind == "lid":
+            work, args, total = write_lid, (parse_lid_payload(body),), 1
+        else:
+            raise ValueError("请选择有效的任务类型")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except LookupError as exc:
+        return jsonify({"error": str(exc), "expired": True}), 410
+    if not renderer_available():
+        return jsonify({"error": "服务器尚未安装 OpenSCAD"}), 503
+    source = {"pin": PIN_SCAD_PATH, "lid": LID_SCAD_PATH}.get(kind)
+    if source is not None and not source.exists():
+        return jsonify({"error": "服务器缺少 SCAD 源文件"}), 503
+
+    job = JOBS.create(kind, total, limit=JOB_MAX_OUTSTANDING)
+    if job is None:
+        response = jsonify({"error": "生成任务过多，请稍后再试"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(JOB_POLL_SECONDS * 5)
+        return response
+    JOB_POOL.submit(run_job, job["id"], work, *args)
+    response = jsonify(job_view(job))
+    response.status_code = 202
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return response
+
+
+@app.get("/api/jobs/<job_id>")
+def job_status(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    response = jsonify(job_view(job))
+    response.headers["Cache-Control"] = "no-store"
+    if job["state"] not in JOB_FINISHED:
+        # Progress is polled: a held-open stream would tie up one of the few gunicorn threads.
+        response.headers["Retry-After"] = str(JOB_POLL_SECONDS)
+    return response
+
+
+@app.get("/api/jobs/<job_id>/artifact")
+def job_artifact(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    if job["state"] != "done":
+        return jsonify({"error": "任务尚未完成", "state": job["state"]}), 409
+    artifact = job["artifact"]
+    if not STL_CACHE.hit(artifact["cache_key"]):
+        return jsonify({"error": "生成结果已被清理，请重新提交", "expired": True}), 410
+    if artifact["mimetype"] != "application/zip":
+        return send_stl(STL_CACHE.path(artifact["cache_key"]), artifact["filename"], True)
+    response = send_file(
+        STL_CACHE.path(artifact["cache_key"], ".zip"), mimetype="application/zip", as_attachment=True,
+        download_name=artifact["filename"], conditional=True, etag=artifact["cache_key"],
+    )
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    return response
+
+
+@app.get("/stl/<cache_key>.stl")
+def immutable_stl(cache_key: str):
+    """Serve a cached STL by key as a public, immutable resource with a strong ETag."""
+    if not STL_KEY_PATTERN.fullmatch(cache_key) or cache_key.startswith("bundle-") or not STL_CACHE.hit(cache_key):
+        return jsonify({"error": "STL 不存在或已被清理"}), 404
+    stl_path = STL_CACHE.path(cache_key)
+    meta = compressed_meta(cache_key)
+    # The front server can only hand out whole files, so it gets the brotli copy or the plain STL.
+    encodings = ("br",) if STL_ACCEL else tuple(ENCODINGS)
+    available = [name for name in encodings if ENCODINGS[name][1] in meta]
+    encoding = request.accept_encodings.best_match(available)
+    etag = f"{cache_key}.{encoding or 'identity'}"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif STL_ACCEL:
+        served = STL_CACHE.path(cache_key, ENCODINGS[encoding][0]) if encoding else stl_path
+        response = Response(mimetype="model/stl")
+        if STL_ACCEL == "nginx":
+            response.headers["X-Accel-Redirect"] = f"{STL_ACCEL_PREFIX}/{served.name}"
+        else:
+            response.headers["X-Sendfile"] = str(served)
+    elif encoding is None:
+        response = send_file(stl_path, mimetype="model/stl", conditional=True, etag=False)
+    else:
+        suffix, section, stream, overhead = ENCODINGS[encoding]
+        response = Response(stream(STL_CACHE.path(cache_key, suffix), meta[section]), mimetype="model/stl")
+        response.content_length = meta[section][f"{section}_size"] + overhead
+    if encoding and response.status_code == 200:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def require_admin():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "admin API is disabled"}), 404
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        return jsonify({"error": "invalid admin token"}), 403
+    return None
+
+
+@app.get("/api/admin/cache")
+def admin_cache_stats():
+    denied = require_admin()
+    if denied:
+        return denied
+    return jsonify(STL_CACHE.stats())
+
+
+@app.route("/api/admin/cache", methods=["DELETE"])
+def admin_cache_purge():
+    denied = require_admin()
+    if denied:
+        return denied
+    prefix = request.args.get("prefix", "")
+    if prefix not in (*PREFIXES, PIECE_PREFIX, "all"):
+        return jsonify({"error": f"prefix must be one of {', '.join((*PREFIXES, PIECE_PREFIX, 'all'))}"}), 400
+    return jsonify(STL_CACHE.purge(None if prefix == "all" else prefix))
+
+
+@app.post("/api/admin/cache/gc")
+def admin_cache_gc():
+    denied = require_admin()
+    if denied:
+        return denied
+    return jsonify(STL_CACHE.collect())
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(METRICS.render(app.logger.exception), content_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
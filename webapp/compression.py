@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses fall back to gzip/deflate.
+    brotli = None
+
+
+CHUNK_SIZE = 256 * 1024
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+ZLIB_HEADER = b"\x78\x9c"
+
+
+def deflate_file(source: Path, target: Path, level: int = 6) -> dict:
+    """Write a raw deflate copy of ``source`` to ``target`` and return its framing metadata.
+
+    The returned CRC32, Adler-32 and sizes are everything a ZIP entry, a gzip member
+    or a zlib stream needs around the stored bytes, so none of them recompress.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc, adler, size = 0, 1, 0
+    partial = target.with_name(f"{target.name}.{os.getpid()}.partial")
+    try:
+        with Path(source).open("rb") as reader, partial.open("wb") as writer:
+            while chunk := reader.read(CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+                adler = zlib.adler32(chunk, adler)
+                size += len(chunk)
+                writer.write(compressor.compress(chunk))
+            writer.write(compressor.flush())
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
+    return {"size": size, "crc32": crc, "adler32": adler, "deflate_size": target.stat().st_size}
+
+
+def brotli_file(source: Path, target: Path) -> dict:
+    """Write a brotli copy of ``source`` to ``target`` (requires the optional ``brotli`` module)."""
+    compressor = brotli.Compressor(mode=brotli.MODE_GENERIC, quality=9)
+    partial = target.with_name(f"{target.name}.{os.getpid()}.partial")
+    try:
+        with Path(source).open("rb") as reader, partial.open("wb") as writer:
+            while chunk := reader.read(CHUNK_SIZE):
+                writer.write(compressor.process(chunk))
+            writer.write(compressor.finish())
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
+    return {"brotli_size": target.stat().st_size}
+
+
+def read_chunks(path: Path) -> Iterator[bytes]:
+    with Path(path).open("rb") as stream:
+        while chunk := stream.read(CHUNK_SIZE):
+            yield chunk
+
+
+def gzip_stream(deflate_path: Path, meta: dict) -> Iterator[bytes]:
+    """Wrap stored raw deflate bytes in a gzip member (``Content-Encoding: gzip``)."""
+    yield GZIP_HEADER
+    yield from read_chunks(deflate_path)
+    yield struct.pack("<II", meta["crc32"], meta["size"] & 0xFFFFFFFF)
+
+
+def zlib_stream(deflate_path: Path, meta: dict) -> Iterator[bytes]:
+    """Wrap stored raw deflate bytes in a zlib stream (``Content-Encoding: deflate``)."""
+    yield ZLIB_HEADER
+    yield from read_chunks(deflate_path)
+    yield struct.pack(">I", meta["adler32"])
+
+
+def stored_stream(path: Path, meta: dict) -> Iterator[bytes]:
+    yield from read_chunks(path)
+
+
+# Content codings in order of preference:
+# name -> (stored file suffix, sidecar section, stream factory, bytes added around the stored data)
+ENCODINGS = {
+    "br": (".stl.br", "brotli", stored_stream, 0),
+    "gzip": (".stl.deflate", "deflate", gzip_stream, len(GZIP_HEADER) + 8),
+    "deflate": (".stl.deflate", "deflate", zlib_stream, len(ZLIB_HEADER) + 4),
+}
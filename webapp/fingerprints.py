@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+
+INCLUDE_PATTERN = re.compile(r"\b(?:include|use)\s*<([^>]+)>")
+# Where OpenSCAD looks for libraries after the including file's own directory.
+DEFAULT_LIBRARY_PATHS = (
+    Path.home() / ".local" / "share" / "OpenSCAD" / "libraries",
+    Path("/usr/share/openscad/libraries"),
+    Path("/usr/local/share/openscad/libraries"),
+)
+
+
+class SourceFingerprints:
+    """Content fingerprints of SCAD sources, their transitive include/use graph and the OpenSCAD version.
+
+    A fingerprint only depends on file contents and paths relative to ``root``, so
+    it is identical for every checkout of the same tree. Results are memoised per
+    set of entry files; ``refresh`` (or the watcher thread) drops the ones whose
+    files or OpenSCAD version changed, so requests never hash sources themselves.
+
+    ``version`` replaces running ``openscad --version`` locally, for services
+    whose renders run elsewhere (the render queue reports its workers' version).
+    """
+
+    def __init__(self, root: Path, openscad: Path, library_paths=(), version: Callable[[], str] | None = None):
+        self.root = Path(root).resolve()
+        self.openscad = Path(openscad)
+        self.library_paths = [self.root, *map(Path, library_paths), *DEFAULT_LIBRARY_PATHS]
+        self._version_source = version
+        self._lock = threading.Lock()
+        # entry files -> (fingerprint, {path: mtime_ns} of every file it covers, OpenSCAD version)
+        self._graphs: dict[tuple[Path, ...], tuple[str, dict[Path, int | None], str]] = {}
+        self._version: tuple[int | None, str] | None = None
+
+    def _mtime(self, path: Path) -> int | None:
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def version(self) -> str:
+        """``openscad --version`` output, re-read when the binary changes."""
+        if self._version_source is not None:
+            return self._version_source()
+        mtime = self._mtime(self.openscad)
+        cached = self._version
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            run = subprocess.run([str(self.openscad), "--version"], capture_output=True, text=True, timeout=30)
+            text = (run.stdout + run.stderr).strip()
+        except (OSError, subprocess.TimeoutExpired):
+            text = ""
+        self._version = (mtime, text)
+        return text
+
+    def _resolve(self, name: str, base: Path) -> Path | None:
+        for directory in (base, *self.library_paths):
+            candidate = directory / name
+            if candidate.is_file():
+                return candidate.resolve()
+        return None
+
+    def _label(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return path.name
+
+    def files(self, entries) -> str:
+        """Fingerprint of ``entries`` and everything they include or use."""
+        key = tuple(sorted({Path(entry).resolve() for entry in entries}))
+        with self._lock:
+            cached = self._graphs.get(key)
+        if cached is not None:
+            return cached[0]
+
+        version = self.version()
+        digest = hashlib.sha256(version.encode("utf-8") + b"\0")
+        mtimes: dict[Path, int | None] = {}
+        seen: set[Path] = set()
+        pending = list(key)
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            mtimes[path] = self._mtime(path)
+            try:
+                text = path.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            for name in INCLUDE_PATTERN.findall(text):
+                found = self._resolve(name, path.parent)
+                if found is None:
+                    # Unresolvable names still count, so adding the library later changes the fingerprint.
+                    digest.update(f"missing:{name}\0".encode("utf-8"))
+                else:
+                    pending.append(found)
+        for path in sorted(seen, key=self._label):
+            digest.update(self._label(path).encode("utf-8") + b"\0")
+            try:
+                digest.update(path.read_bytes())
+            except OSError:
+                pass
+            digest.update(b"\0")
+        fingerprint = digest.hexdigest()
+        with self._lock:
+            self._graphs[key] = (fingerprint, mtimes, version)
+        return fingerprint
+
+    def code(self, code: str) -> str:
+        """Fingerprint of the library files a generated SCAD snippet includes or uses."""
+        entries = [self._resolve(name, self.root) for name in INCLUDE_PATTERN.findall(code)]
+        return self.files(entry for entry in entries if entry is not None)
+
+    def refresh(self) -> int:
+        """Forget fingerprints whose files or OpenSCAD version changed; return how many were dropped."""
+        with self._lock:
+            graphs = list(self._graphs.items())
+        version = self.version() if graphs else ""
+        stale = [key for key, (_, mtimes, graph_version) in graphs
+                 if graph_version != version or any(self._mtime(path) != mtime for path, mtime in mtimes.items())]
+        with self._lock:
+            for key in stale:
+                self._graphs.pop(key, None)
+        return len(stale)
+
+    def start_watcher(self, interval: float, log_error) -> threading.Thread:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception:
+                    log_error("SCAD source fingerprint refresh failed")
+
+        thread = threading.Thread(target=loop, name="scad-fingerprints", daemon=True)
+        thread.start()
+        return thread
+
+
+def library_paths_from_environment() -> list[Path]:
+    return [Path(item) for item in os.environ.get("OPENSCADPATH", "").split(os.pathsep) if item]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+FINISHED = ("done", "failed")
+
+
+class JobStore:
+    """In-memory registry of background render jobs and their progress.
+
+    A job is a plain dict with ``id``, ``kind``, ``state`` (queued, running, done
+    or failed), ``stage``, ``done``/``total`` progress, ``error`` and, once done,
+    ``artifact``. Finished jobs are evicted oldest first beyond ``capacity`` and
+    after ``ttl`` seconds; unfinished ones are bounded by ``create``'s ``limit``.
+    """
+
+    def __init__(self, capacity: int, ttl: float = 3600):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+
+    def create(self, kind: str, total: int = 1, limit: int | None = None) -> dict | None:
+        """Register a queued job, or return None if ``limit`` jobs are already unfinished."""
+        now = time.time()
+        job = {
+            "id": secrets.token_urlsafe(12), "kind": kind, "state": "queued", "stage": "queued",
+            "done": 0, "total": total, "error": None, "artifact": None, "created": now, "updated": now,
+        }
+        with self._lock:
+            self._expire(now)
+            if limit is not None and self._outstanding() >= limit:
+                return None
+            self._jobs[job["id"]] = job
+            return dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated=time.time())
+
+    def advance(self, job_id: str, count: int = 1) -> None:
+        """Add ``count`` finished steps to the progress of a job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(done=min(job["total"], job["done"] + count), updated=time.time())
+
+    def outstanding(self) -> int:
+        """Number of queued or running jobs."""
+        with self._lock:
+            return self._outstanding()
+
+    def _outstanding(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["state"] not in FINISHED)
+
+    def _expire(self, now: float) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["state"] in FINISHED]
+        for job_id in finished:
+            if len(self._jobs) >= self.capacity or now - self._jobs[job_id]["updated"] > self.ttl:
+                del self._jobs[job_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._jobs)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from functools import cached_property
+from pathlib import Path
+
+
+def scad_define(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(scad_define(item) for item in value) + "]"
+    return f"{float(value):.4f}"
+
+
+def openscad_summary(path: Path) -> dict:
+    """The scalar geometry statistics of an OpenSCAD ``--summary-file`` (empty if unavailable)."""
+    try:
+        summary = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    geometry = summary.get("geometry") if isinstance(summary, dict) else None
+    if not isinstance(geometry, dict):
+        return {}
+    return {key: value for key, value in geometry.items() if isinstance(value, (int, float, str, bool))}
+
+
+class OpenScad:
+    """Runs one OpenSCAD binary; shared by the web service and render_worker.py.
+
+    Importing this module starts nothing. ``running``, ``failures`` and
+    ``seconds`` are optional metrics (a gauge, a counter labelled by generator
+    and reason, a histogram labelled by generator) that the web service passes in.
+    """
+
+    def __init__(self, binary: str, root: Path, *, timeout: float = 300, logger: logging.Logger | None = None,
+                 running=None, failures=None, seconds=None):
+        self.binary = binary
+        self.root = Path(root)
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.running = running
+        self.failures = failures
+        self.seconds = seconds
+
+    def available(self) -> bool:
+        return Path(self.binary).exists()
+
+    @cached_property
+    def help(self) -> str:
+        try:
+            run = subprocess.run([self.binary, "--help"], capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+        # OpenSCAD prints its usage to stderr.
+        return run.stdout + run.stderr
+
+    def version(self) -> str:
+        """``openscad --version`` output (empty if the binary cannot run)."""
+        try:
+            run = subprocess.run([self.binary, "--version"], capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+        return (run.stdout + run.stderr).strip()
+
+    def run(self, command: list[str], environment: dict[str, str], timeout: float) -> tuple[int, str, resource.struct_rusage]:
+        """Run OpenSCAD and return its exit code, stderr and its own resource usage.
+
+        The child is reaped with ``os.wait4`` rather than through ``RUSAGE_CHILDREN``
+        deltas, which would mix up renders running in parallel threads.
+        """
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(command, cwd=self.root, env=environment, stdout=subprocess.DEVNULL, stderr=stderr)
+            timed_out = threading.Event()
+
+            def kill() -> None:
+                timed_out.set()
+                process.kill()
+
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+            try:
+                _, status, usage = os.wait4(process.pid, 0)
+            finally:
+                timer.cancel()
+            process.returncode = os.waitstatus_to_exitcode(status)
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(command, timeout)
+            stderr.seek(0)
+            return process.returncode, stderr.read().decode("utf-8", errors="replace"), usage
+
+    def _count_failure(self, generator: str, reason: str) -> None:
+        if self.failures is not None:
+            self.failures.inc(generator=generator, reason=reason)
+
+    def render(self, scad_path: Path, stl_path: Path, defines: dict[str, float | bool] | None = None,
+               *, generator: str) -> dict:
+        """Render ``scad_path`` to ``stl_path`` and return its profile.
+
+        ``generator`` (piece/bin/pin/lid) labels the metrics. The profile holds the wall
+        time, the children's CPU time and peak RSS, the backend that produced the mesh
+        and OpenSCAD's own geometry summary when the binary supports ``--summary``.
+        """
+        environment = os.environ.copy()
+        environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+        # Generated code includes the library relative to the checkout.
+        environment["OPENSCADPATH"] = os.pathsep.join(filter(None, [str(self.root), environment.get("OPENSCADPATH")]))
+        arguments = []
+        for name, value in (defines or {}).items():
+            arguments.extend(["-D", f"{name}={scad_define(value)}"])
+        # Binary STL is several times smaller and faster to parse in the viewer.
+        if "binstl" in self.help:
+            arguments.extend(["--export-format", "binstl"])
+        summary_path = stl_path.with_name(stl_path.name + ".summary.json")
+        if "--summary-file" in self.help:
+            arguments.extend(["--summary", "all", "--summary-file", str(summary_path)])
+        arguments.extend(["-o", str(stl_path), str(scad_path)])
+
+        # Nightly uses the faster Manifold backend. OpenSCAD 2021.01 does not know
+        # this option, so retry once without it for local development compatibility.
+        attempts = ([self.binary, "--backend=Manifold"], [self.binary])
+        last_error = ""
+        started = time.monotonic()
+        cpu_seconds, max_rss_kb = 0.0, 0
+        try:
+            for prefix in attempts:
+                stl_path.unlink(missing_ok=True)
+                if self.running is not None:
+                    self.running.inc()
+                try:
+                    returncode, last_error, usage = self.run([*prefix, *arguments], environment, self.timeout)
+                except subprocess.TimeoutExpired:
+                    self._count_failure(generator, "timeout")
+                    raise
+                finally:
+                    if self.running is not None:
+                        self.running.dec()
+                cpu_seconds += usage.ru_utime + usage.ru_stime
+                # Linux reports ru_maxrss in KiB.
+                max_rss_kb = max(max_rss_kb, usage.ru_maxrss)
+                if not returncode and stl_path.exists():
+                    wall_seconds = time.monotonic() - started
+                    if self.seconds is not None:
+                        self.seconds.observe(wall_seconds, generator=generator)
+                    return {
+                        "generator": generator,
+                        "rendered_at": time.time(),
+                        "wall_seconds": round(wall_seconds, 3),
+                        "cpu_seconds": round(cpu_seconds, 3),
+                        "max_rss_kb": max_rss_kb,
+                        "backend": "manifold" if "--backend=Manifold" in prefix else "default",
+                        "summary": openscad_summary(summary_path),
+                    }
+                if prefix is not attempts[-1]:
+                    # Not silent: a fallback usually means a much slower render.
+                    self._count_failure(generator, "backend_fallback")
+                    self.logger.warning(
+                        "OpenSCAD %s failed, retrying with the default backend: %s", " ".join(prefix[1:]), last_error[-500:],
+                    )
+        finally:
+            summary_path.unlink(missing_ok=True)
+        self._count_failure(generator, "error")
+        self.logger.error("OpenSCAD failed: %s", last_error[-2000:])
+        raise RuntimeError("STL 生成失败，请稍后重试")
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+
+class PlanStore:
+    """In-memory LRU of computed plans keyed by ``plan_id``.
+
+    Plans are pure functions of their parameters, so a lost entry (eviction,
+    restart, another worker process) only costs a recomputation by the caller.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._plans: OrderedDict[str, tuple[dict, dict]] = OrderedDict()
+
+    def get(self, plan_id: str) -> tuple[dict, dict] | None:
+        """Return ``(values, plan)`` for ``plan_id`` and mark it recently used."""
+        with self._lock:
+            entry = self._plans.get(plan_id)
+            if entry is not None:
+                self._plans.move_to_end(plan_id)
+            return entry
+
+    def put(self, plan_id: str, values: dict, plan: dict) -> None:
+        with self._lock:
+            self._plans[plan_id] = (values, plan)
+            self._plans.move_to_end(plan_id)
+            while len(self._plans) > self.capacity:
+                self._plans.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._plans)
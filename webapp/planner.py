@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import bisect
 import math
 from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+import numpy as np
 
 
 @dataclass
@@ -17,8 +21,25 @@ class Piece:
         return asdict(self)
 
 
-def _segments(cell_count: int, max_cells: int) -> list[int]:
+CENTER_SPLITS = ("even", "greedy", "uniform")
+
+
+def _segments(cell_count: int, max_cells: int, split: str = "even") -> list[int]:
+    """Split ``cell_count`` cells into segments of at most ``max_cells``.
+
+    ``even``: fewest segments, sizes differing by at most one cell.
+    ``greedy``: full-size segments plus one remainder segment.
+    ``uniform``: all segments the same size, using up to two more segments than
+    the minimum; falls back to ``even`` when no such split exists.
+    """
     count = math.ceil(cell_count / max_cells)
+    if split == "greedy":
+        full, remainder = divmod(cell_count, max_cells)
+        return [max_cells] * full + ([remainder] if remainder else [])
+    if split == "uniform":
+        for uniform_count in range(count, count + 3):
+            if cell_count % uniform_count == 0:
+                return [cell_count // uniform_count] * uniform_count
     base, remainder = divmod(cell_count, count)
     return [base + (1 if index < remainder else 0) for index in range(count)]
 
@@ -61,10 +82,12 @@ def _kind(x: float, y: float, w: float, h: float, width: float, depth: float) ->
 
 
 def make_plan(width: float, depth: float, printer_x: float, printer_y: float,
-              grid: float = 42.0, min_margin_cells: int = 1) -> dict:
+              grid: float = 42.0, min_margin_cells: int = 1, center_split: str = "even") -> dict:
     values = (width, depth, printer_x, printer_y, grid)
     if any(not math.isfinite(value) or value <= 0 for value in values):
         raise ValueError("所有尺寸都必须是大于 0 的数字")
+    if center_split not in CENTER_SPLITS:
+        raise ValueError("中心拆分方式无效")
     if min_margin_cells < 0 or min_margin_cells > 10:
         raise ValueError("边缘格数需要在 0 到 10 之间")
     if printer_x < grid or printer_y < grid:
@@ -81,8 +104,8 @@ def make_plan(width: float, depth: float, printer_x: float, printer_y: float,
     if margin_x > printer_x + 1e-7 or margin_y > printer_y + 1e-7:
         raise ValueError("对称边缘超过打印机范围，请减小边缘格数或增大打印尺寸")
 
-    x_center = _segments(gx, max(1, math.floor(printer_x / grid)))
-    y_center = _segments(gy, max(1, math.floor(printer_y / grid)))
+    x_center = _segments(gx, max(1, math.floor(printer_x / grid)), center_split)
+    y_center = _segments(gy, max(1, math.floor(printer_y / grid)), center_split)
     center_widths = [cells * grid for cells in x_center]
     center_heights = [cells * grid for cells in y_center]
 
@@ -133,6 +156,74 @@ def make_plan(width: float, depth: float, printer_x: float, printer_y: float,
     }
 
 
+PLAN_TABLE_COLUMNS = (
+    "width", "depth", "printer_x_cells", "printer_y_cells", "min_margin_cells",
+    "grid_x", "grid_y", "margin_x", "margin_y",
+    "center_x_segments", "center_y_segments",
+    "center_x_cells_max", "center_x_cells_min", "center_y_cells_max", "center_y_cells_min",
+    "edge_x_segments", "edge_y_segments", "piece_count", "error",
+)
+PLAN_TABLE_ERRORS = (
+    None,
+    "抽屉太小，无法同时容纳当前网格和对称边缘",
+    "对称边缘超过打印机范围，请减小边缘格数或增大打印尺寸",
+)
+
+
+def _pack_counts(cells: np.ndarray, margin: np.ndarray, maximum: np.ndarray, grid: float) -> np.ndarray:
+    """Number of segments ``_pack`` makes of ``[margin] + [grid] * cells + [margin]``, element-wise."""
+    per_segment = np.floor((maximum + 1e-7) / grid)
+    # The first segment holds the leading margin and as many cells as still fit.
+    first = np.minimum(cells, np.floor((maximum + 1e-7 - margin) / grid))
+    rest = cells - first
+    full = np.ceil(rest / per_segment)
+    last = rest - (full - 1) * per_segment
+    trailing_fits = np.where(rest > 0, last * grid, first * grid + margin) + margin <= maximum + 1e-7
+    return 1 + full + ~trailing_fits
+
+
+def plan_table(widths, depths, printer_x_cells, printer_y_cells, margin_cells, grid: float = 42.0) -> dict:
+    """Plan every combination of the given values in one vectorised pass.
+
+    Returns ``{"columns": [...], "rows": [...]}`` with one row per combination and
+    the same counts ``make_plan`` would produce. Combinations ``make_plan`` rejects
+    keep its message in the ``error`` column and zeros in the computed columns.
+    Inputs are expected to be validated already (positive sizes, whole cell counts).
+    """
+    axes = [np.asarray(values, dtype=np.float64).ravel()
+            for values in (widths, depths, printer_x_cells, printer_y_cells, margin_cells)]
+    width, depth, cells_x, cells_y, margins = (axis.ravel() for axis in np.meshgrid(*axes, indexing="ij"))
+    printer_x, printer_y = cells_x * grid, cells_y * grid
+    min_margin = margins * grid
+
+    error = np.where((width < grid + 2 * min_margin) | (depth < grid + 2 * min_margin), 1, 0)
+    gx = np.where(error, 0, np.floor((width - 2 * min_margin) / grid))
+    gy = np.where(error, 0, np.floor((depth - 2 * min_margin) / grid))
+    margin_x = (width - gx * grid) / 2
+    margin_y = (depth - gy * grid) / 2
+    error = np.where(~error.astype(bool) & ((margin_x > printer_x + 1e-7) | (margin_y > printer_y + 1e-7)), 2, error)
+    valid = error == 0
+    gx, gy = np.where(valid, gx, 0), np.where(valid, gy, 0)
+    margin_x, margin_y = np.where(valid, margin_x, 0), np.where(valid, margin_y, 0)
+
+    center_x = np.ceil(gx / cells_x)
+    center_y = np.ceil(gy / cells_y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_max, x_min = np.where(valid, np.ceil(gx / center_x), 0), np.where(valid, np.floor(gx / center_x), 0)
+        y_max, y_min = np.where(valid, np.ceil(gy / center_y), 0), np.where(valid, np.floor(gy / center_y), 0)
+    edge_x = np.where(valid, _pack_counts(gx, margin_x, printer_x, grid), 0)
+    edge_y = np.where(valid, _pack_counts(gy, margin_y, printer_y, grid), 0)
+    # Zero-width margins produce no edge pieces (see ``add`` in ``make_plan``).
+    pieces = 2 * edge_x * (margin_y > 1e-7) + 2 * center_y * (margin_x > 1e-7) + center_x * center_y
+
+    integers = [array.astype(np.int64).tolist() for array in (
+        cells_x, cells_y, margins, gx, gy, center_x, center_y, x_max, x_min, y_max, y_min, edge_x, edge_y, pieces,
+    )]
+    columns = [width.tolist(), depth.tolist(), *integers[:5], margin_x.tolist(), margin_y.tolist(), *integers[5:],
+               [PLAN_TABLE_ERRORS[code] for code in error.tolist()]]
+    return {"columns": list(PLAN_TABLE_COLUMNS), "rows": [list(row) for row in zip(*columns)]}
+
+
 def fit_for_kind(kind: str) -> tuple[int, int]:
     mapping = {
         "corner_lt": (-1, 1), "corner_rt": (1, 1),
@@ -142,3 +233,171 @@ def fit_for_kind(kind: str) -> tuple[int, int]:
         "center": (0, 0),
     }
     return mapping[kind]
+
+
+def kind_for_fit(fit_x: int, fit_y: int) -> str:
+    for kind in ("center", "edge_left", "edge_right", "edge_top", "edge_bottom",
+                 "corner_lt", "corner_rt", "corner_lb", "corner_rb"):
+        if fit_for_kind(kind) == (fit_x, fit_y):
+            return kind
+    raise ValueError(f"invalid fit offset: {(fit_x, fit_y)}")
+
+
+# The symmetries of the square as 2x2 matrices acting on (x, y). A baseplate piece
+# is symmetric under all of them, so pieces that only differ by one share a mesh.
+SYMMETRIES = {
+    "identity": ((1, 0), (0, 1)),
+    "mirror_x": ((-1, 0), (0, 1)),
+    "mirror_y": ((1, 0), (0, -1)),
+    "rotate_180": ((-1, 0), (0, -1)),
+    "rotate_90": ((0, -1), (1, 0)),
+    "rotate_270": ((0, 1), (-1, 0)),
+    "transpose": ((0, 1), (1, 0)),
+    "anti_transpose": ((0, -1), (-1, 0)),
+}
+
+
+def canonical_piece(piece: dict) -> tuple[dict, str]:
+    """Return the canonical representative of ``piece`` and the symmetry mapping it back.
+
+    Pieces with the same (w, h) up to mirroring or rotation, and matching fit
+    offsets, get the same canonical piece. Applying ``SYMMETRIES[name]`` to the
+    canonical mesh around the origin yields the mesh of ``piece``.
+    """
+    fit_x, fit_y = fit_for_kind(piece["kind"])
+    best = None
+    for name, ((a, b), (c, d)) in SYMMETRIES.items():
+        # Orthogonal matrices invert by transposition.
+        w, h = (piece["h"], piece["w"]) if a == 0 else (piece["w"], piece["h"])
+        fit = (a * fit_x + c * fit_y, b * fit_x + d * fit_y)
+        candidate = (round(w, 6), round(h, 6), fit)
+        if best is None or candidate < best[0]:
+            best = (candidate, name, w, h)
+    (_, _, fit), name, w, h = best
+    return {"w": w, "h": h, "kind": kind_for_fit(*fit)}, name
+
+
+# Cost model of the optimizer, in seconds of work: handling and slicing one more
+# printed piece, rendering one distinct geometry (base plus per grid cell, a cold
+# cache renders every distinct canonical piece once), and printing solid margin
+# instead of the mostly hollow grid, per cm².
+PIECE_SECONDS = 120.0
+RENDER_SECONDS_BASE = 5.0
+RENDER_SECONDS_PER_CELL = 0.8
+MARGIN_SECONDS_PER_CM2 = 0.05
+
+
+@lru_cache(maxsize=4096)
+def _plan_cost(width: float, depth: float, printer_x: float, printer_y: float, grid: float,
+               min_margin_cells: int, center_split: str) -> dict | None:
+    """Score one candidate plan, or ``None`` if ``make_plan`` rejects it."""
+    try:
+        plan = make_plan(width, depth, printer_x, printer_y, grid, min_margin_cells, center_split)
+    except ValueError:
+        return None
+    distinct = {tuple(canonical_piece(piece)[0].values()) for piece in plan["pieces"]}
+    render_seconds = sum(RENDER_SECONDS_BASE + RENDER_SECONDS_PER_CELL * w * h / grid ** 2 for w, h, _ in distinct)
+    margin_cm2 = (width * depth - plan["grid_count"]["total"] * grid ** 2) / 100
+    pieces = plan["piece_count"]
+    return {
+        "score": round(pieces * PIECE_SECONDS + render_seconds + margin_cm2 * MARGIN_SECONDS_PER_CM2, 3),
+        "pieces": pieces,
+        "distinct_geometries": len(distinct),
+        "render_seconds": round(render_seconds, 1),
+        "margin_cm2": round(margin_cm2, 1),
+    }
+
+
+def optimize_plan(width: float, depth: float, printer_x: float, printer_y: float, grid: float = 42.0,
+                  min_margin_cells: int = 1, max_margin_cells: int | None = None) -> dict:
+    """Return the cheapest plan over printer orientation, margin cells and center split.
+
+    Margins are only widened up to ``max_margin_cells`` (default: not at all),
+    since wider margins leave fewer grid cells. A rotated plan fits the bed with
+    every piece turned 90 degrees. Candidate scores are memoised across calls.
+    The result is a ``make_plan`` dict plus an ``optimizer`` section.
+    """
+    max_margin_cells = min_margin_cells if max_margin_cells is None else max_margin_cells
+    candidates = []
+    for rotated in (False, True):
+        bed = (printer_y, printer_x) if rotated else (printer_x, printer_y)
+        for margin_cells in range(min_margin_cells, max_margin_cells + 1):
+            for split in CENTER_SPLITS:
+                cost = _plan_cost(width, depth, *bed, grid, margin_cells, split)
+                if cost is not None:
+                    candidates.append((cost["score"], len(candidates), rotated, margin_cells, split, cost))
+    if not candidates:
+        # Nothing fits: report the same error as the plain planner.
+        return make_plan(width, depth, printer_x, printer_y, grid, min_margin_cells)
+    baseline = _plan_cost(width, depth, printer_x, printer_y, grid, min_margin_cells, "even")
+    _, _, rotated, margin_cells, split, cost = min(candidates)
+    bed = (printer_y, printer_x) if rotated else (printer_x, printer_y)
+    plan = make_plan(width, depth, *bed, grid, margin_cells, split)
+    plan["printer"] = {"width": printer_x, "depth": printer_y}
+    plan["optimizer"] = {
+        "printer_rotated": rotated,
+        "min_margin_cells": margin_cells,
+        "center_split": split,
+        "candidates": len(candidates),
+        "cost": cost,
+        "baseline_cost": baseline,
+    }
+    return plan
+
+
+def verify_tiling(pieces, width: float, depth: float, printer_x: float, printer_y: float,
+                  tolerance: float = 1e-6) -> list[str]:
+    """Return the problems that keep ``pieces`` from exactly tiling a ``width`` x ``depth`` drawer.
+
+    ``pieces`` are dicts with ``pid``, ``x``, ``y``, ``w`` and ``h``. A piece must lie
+    inside the drawer and fit the printer bed in either orientation. Pieces that
+    pairwise do not overlap and whose areas add up to the drawer's cover it exactly.
+    Overlaps are found with a sweep over x that keeps the y-intervals of the pieces
+    crossing the sweep line sorted, so each piece is only compared with its two
+    neighbours (O(n log n) comparisons).
+    """
+    problems = []
+    events = []
+    area = 0.0
+    for piece in pieces:
+        pid, x, y, w, h = piece["pid"], piece["x"], piece["y"], piece["w"], piece["h"]
+        if w <= tolerance or h <= tolerance:
+            problems.append(f"piece {pid} is empty ({w:g} x {h:g})")
+            continue
+        if x < -tolerance or y < -tolerance or x + w > width + tolerance or y + h > depth + tolerance:
+            problems.append(f"piece {pid} leaves the drawer")
+        if not ((w <= printer_x + tolerance and h <= printer_y + tolerance)
+                or (h <= printer_x + tolerance and w <= printer_y + tolerance)):
+            problems.append(f"piece {pid} ({w:g} x {h:g}) exceeds the printer bed")
+        area += w * h
+        # Pieces that only touch along x are removed before the next one is added.
+        events.append((x + w - tolerance, 0, y, y + h, pid))
+        events.append((x, 1, y, y + h, pid))
+    events.sort()
+
+    active: list[tuple[float, float, int]] = []
+    for _, entering, low, high, pid in events:
+        index = bisect.bisect_left(active, (low, high, pid))
+        if not entering:
+            if index < len(active) and active[index][2] == pid:
+                del active[index]
+            continue
+        neighbours = active[max(index - 1, 0):index + 1]
+        clashes = [other for other in neighbours if min(high, other[1]) - max(low, other[0]) > tolerance]
+        if clashes:
+            problems.append(f"piece {pid} overlaps piece {clashes[0][2]}")
+            # Keep the active intervals disjoint so neighbour checks stay sufficient.
+            continue
+        active.insert(index, (low, high, pid))
+
+    if abs(area - width * depth) > tolerance * max(1.0, width + depth):
+        problems.append(f"pieces cover {area:g} mm² of a {width * depth:g} mm² drawer")
+    return problems
+
+
+def verify_plan(plan: dict, tolerance: float = 1e-6) -> list[str]:
+    """``verify_tiling`` for a ``make_plan``/``optimize_plan`` result."""
+    return verify_tiling(
+        plan["pieces"], plan["drawer"]["width"], plan["drawer"]["depth"],
+        plan["printer"]["width"], plan["printer"]["depth"], tolerance,
+    )
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import secrets
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def store_name(path: Path, bases: dict[str, Path]) -> str:
+    """Name of a file in the shared store that every render node resolves against its own ``bases``."""
+    path = Path(path).resolve()
+    for prefix, base in bases.items():
+        if path.is_relative_to(base.resolve()):
+            return f"{prefix}:{path.relative_to(base.resolve()).as_posix()}"
+    return str(path)
+
+
+def resolve_store_name(name: str, bases: dict[str, Path]) -> Path:
+    prefix, _, relative = name.partition(":")
+    base = bases.get(prefix)
+    return base / relative if base is not None and relative else Path(name)
+
+
+class RenderQueue(ABC):
+    """Hand-off of OpenSCAD renders from web processes to render workers.
+
+    A task is a dict with ``scad`` and ``output`` (``store_name`` paths),
+    ``defines``, ``generator`` and ``openscad_version``. Web processes ``submit``
+    a task and ``wait`` for it; workers ``claim`` tasks, render them and report
+    back with ``complete`` or ``fail``. A claim is a lease: a task whose worker
+    died is handed out again once the lease runs out.
+
+    Workers ``heartbeat`` their OpenSCAD version. Web processes key their cache
+    with ``worker_version`` and stamp it on tasks, and workers only claim tasks
+    stamped with their own version, so a cached STL always comes from the
+    OpenSCAD its key names.
+    """
+
+    @abstractmethod
+    def submit(self, task: dict) -> str:
+        """Queue ``task`` and return its id."""
+
+    @abstractmethod
+    def wait(self, task_id: str, timeout: float) -> dict | None:
+        """Return the finished task (``state`` is done or failed), or None after ``timeout`` seconds."""
+
+    @abstractmethod
+    def cancel(self, task_id: str) -> None:
+        """Forget a task whose submitter stopped waiting; a late result is dropped."""
+
+    @abstractmethod
+    def claim(self, worker: str, lease: float, version: str) -> dict | None:
+        """Take the oldest available task for OpenSCAD ``version`` for ``lease`` seconds, or return None."""
+
+    @abstractmethod
+    def complete(self, task_id: str, profile: dict) -> None:
+        """Report a rendered task with its render profile."""
+
+    @abstractmethod
+    def fail(self, task_id: str, error: str) -> None:
+        """Report a task that could not be rendered."""
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """Number of tasks by state."""
+
+    @abstractmethod
+    def heartbeat(self, worker: str, version: str) -> None:
+        """Record that ``worker`` is alive and runs OpenSCAD ``version``."""
+
+    @abstractmethod
+    def worker_version(self) -> str:
+        """OpenSCAD version of most live workers (empty if none is alive)."""
+
+
+class SqliteRenderQueue(RenderQueue):
+    """Render queue in a SQLite file shared by every web and worker process.
+
+    Fits one host or hosts sharing a filesystem with working locks; waiting web
+    processes poll the file. Finished tasks are deleted when their submitter
+    reads them, so the table only holds outstanding work.
+    """
+
+    def __init__(self, path: Path, max_attempts: int = 3, poll_seconds: float = 0.5, worker_timeout: float = 90):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.worker_timeout = worker_timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id TEXT PRIMARY KEY, task TEXT NOT NULL, state TEXT NOT NULL, worker TEXT,"
+                " lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT,"
+                " created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, created)")
+            db.execute("CREATE TABLE IF NOT EXISTS workers (name TEXT PRIMARY KEY, version TEXT NOT NULL, seen REAL NOT NULL)")
+
+    @contextmanager
+    def _connect(self, write: bool = True):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            if not write:
+                yield db
+                return
+            # IMMEDIATE takes the write lock up front, so two workers never claim the same task.
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def submit(self, task: dict) -> str:
+        task_id = secrets.token_hex(12)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO tasks (id, task, state, created, updated) VALUES (?, ?, 'queued', ?, ?)",
+                (task_id, json.dumps(task, sort_keys=True), now, now),
+            )
+        return task_id
+
+    def wait(self, task_id: str, timeout: float) -> dict | None:
+        deadline = time.monotonic() + timeout
+        while True:
+            # Polls only read, so waiting web processes do not compete with claiming workers for the write lock.
+            with self._connect(write=False) as db:
+                row = db.execute("SELECT state, result FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return {"state": "failed", "error": "render task disappeared"}
+            if row[0] in ("done", "failed"):
+                with self._connect() as db:
+                    db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                return {"state": row[0], **json.loads(row[1] or "{}")}
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(self.poll_seconds, max(0.0, deadline - time.monotonic())))
+
+    def cancel(self, task_id: str) -> None:
+        # A worker already rendering it finds the row gone and drops its result.
+        with self._connect() as db:
+            db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def claim(self, worker: str, lease: float, version: str) -> dict | None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE tasks SET state = 'failed', result = ?, updated = ?"
+                " WHERE state = 'running' AND lease_until < ? AND attempts >= ?",
+                (json.dumps({"error": "render worker lost"}), now, now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, task FROM tasks"
+                " WHERE (state = 'queued' OR (state = 'running' AND lease_until < ?))"
+                " AND json_extract(task, '$.openscad_version') = ?"
+                " ORDER BY created LIMIT 1",
+                (now, version),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET state = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                " updated = ? WHERE id = ?",
+                (worker, now + lease, now, row[0]),
+            )
+        return {"id": row[0], **json.loads(row[1])}
+
+    def _finish(self, task_id: str, state: str, result: dict) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE tasks SET state = ?, result = ?, updated = ? WHERE id = ? AND state = 'running'",
+                (state, json.dumps(result, default=str), time.time(), task_id),
+            )
+
+    def complete(self, task_id: str, profile: dict) -> None:
+        self._finish(task_id, "done", {"profile": profile})
+
+    def fail(self, task_id: str, error: str) -> None:
+        self._finish(task_id, "failed", {"error": error})
+
+    def counts(self) -> dict[str, int]:
+        with self._connect(write=False) as db:
+            return dict(db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+
+    def heartbeat(self, worker: str, version: str) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO workers (name, version, seen) VALUES (?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET version = excluded.version, seen = excluded.seen",
+                (worker, version, now),
+            )
+            db.execute("DELETE FROM workers WHERE seen < ?", (now - 24 * 3600,))
+
+    def worker_version(self) -> str:
+        with self._connect(write=False) as db:
+            row = db.execute(
+                "SELECT version FROM workers WHERE seen >= ? AND version != ''"
+                " GROUP BY version ORDER BY COUNT(*) DESC, MAX(seen) DESC LIMIT 1",
+                (time.time() - self.worker_timeout,),
+            ).fetchone()
+        return row[0] if row else ""
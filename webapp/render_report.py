@@ -0,0 +1,84 @@
+"""
+Rank the slowest renders recorded in the STL cache sidecars.
+
+    python render_report.py --top 20
+    python render_report.py --generator bin --by cut_mode,divx
+    python render_report.py --sort max_rss_kb --json
+
+Every OpenSCAD render stores its wall time, CPU time, peak RSS, backend and
+geometry summary next to the STL; this groups them by parameter combination
+(or by the parameters given with --by) to show which options are expensive.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from stl_cache import StlCache
+
+# The same cache settings as the web service (app.py), which this report does not import.
+ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = Path(os.environ.get("GRIDFINITY_CACHE_DIR") or ROOT / "cache" / "stl")
+
+
+SORT_FIELDS = ("wall_seconds", "cpu_seconds", "max_rss_kb")
+
+
+def group_profiles(profiles, generator: str | None, by: list[str]) -> list[dict]:
+    """Aggregate ``(key, profile)`` pairs per generator and parameter combination."""
+    groups: dict[str, list[dict]] = defaultdict(list)
+    for _, profile in profiles:
+        if generator and profile.get("generator") != generator:
+            continue
+        parameters = profile.get("parameters") or {}
+        if by:
+            parameters = {name: parameters.get(name) for name in by}
+        groups[json.dumps([profile.get("generator"), parameters], sort_keys=True, ensure_ascii=False)].append(profile)
+
+    rows = []
+    for key, items in groups.items():
+        generator_name, parameters = json.loads(key)
+        row = {"generator": generator_name, "parameters": parameters, "renders": len(items)}
+        for field in SORT_FIELDS:
+            values = [item.get(field, 0) for item in items]
+            row[field] = max(values)
+            row[f"mean_{field}"] = round(sum(values) / len(values), 3)
+        row["facets"] = max(int((item.get("summary") or {}).get("facets") or 0) for item in items)
+        row["backends"] = sorted({item.get("backend", "") for item in items})
+        row["batched"] = sum(1 for item in items if item.get("batch_size"))
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--generator", choices=("piece", "bin", "pin", "lid"))
+    parser.add_argument("--by", default="", help="comma separated parameter names to group by instead of the full combination")
+    parser.add_argument("--sort", choices=SORT_FIELDS, default="wall_seconds", help="rank by the maximum of this field")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    cache = StlCache(CACHE_DIR, int(os.environ.get("GRIDFINITY_CACHE_MAX_BYTES") or 4 * 1024 ** 3))
+    rows = group_profiles(cache.profiles(), args.generator, [name for name in args.by.split(",") if name])
+    rows.sort(key=lambda row: row[args.sort], reverse=True)
+    rows = rows[:args.top]
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print(f"{'wall s':>8} {'cpu s':>8} {'rss MiB':>8} {'facets':>8} {'n':>4}  generator parameters")
+    for row in rows:
+        # Batched pieces share one OpenSCAD run, so their times cover the whole batch.
+        marker = "*" if row["batched"] else " "
+        print(
+            f"{row['wall_seconds']:8.1f} {row['cpu_seconds']:8.1f} {row['max_rss_kb'] / 1024:8.0f} "
+            f"{row['facets']:8d} {row['renders']:4d}{marker} {row['generator']:9s} "
+            f"{json.dumps(row['parameters'], ensure_ascii=False, sort_keys=True)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Render OpenSCAD tasks from the shared render queue.
+
+    GRIDFINITY_RENDER_QUEUE=/var/cache/gridfinity-stl/render-queue.sqlite3 python render_worker.py --concurrency 4
+
+Web processes started with the same GRIDFINITY_RENDER_QUEUE hand their renders
+to the queue instead of running OpenSCAD themselves. Start as many workers as
+needed, on this host or on others that mount the same GRIDFINITY_CACHE_DIR and
+queue file; every node needs the same library checkout. Workers report their
+OpenSCAD version and only take tasks keyed with it, so during an OpenSCAD
+upgrade renders go to the version most workers run.
+SIGTERM lets running renders finish before the worker exits.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import shutil
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+
+from openscad import OpenScad
+from render_queue import SqliteRenderQueue, resolve_store_name
+
+# The same settings as the web service (app.py), which this worker does not import.
+ROOT = Path(__file__).resolve().parents[1]
+OPENSCAD = os.environ.get("OPENSCAD_BIN") or shutil.which("openscad") or "/usr/bin/openscad"
+CACHE_DIR = Path(os.environ.get("GRIDFINITY_CACHE_DIR") or ROOT / "cache" / "stl")
+STORE_BASES = {"cache": CACHE_DIR, "root": ROOT}
+RENDER_QUEUE_PATH = os.environ.get("GRIDFINITY_RENDER_QUEUE", "")
+LOG = logging.getLogger("render_worker")
+# Web processes only count workers seen within the queue's worker_timeout (90 s).
+HEARTBEAT_SECONDS = 30
+
+
+def render_task(queue: SqliteRenderQueue, runner: OpenScad, task: dict) -> None:
+    try:
+        profile = runner.render(
+            resolve_store_name(task["scad"], STORE_BASES), resolve_store_name(task["output"], STORE_BASES),
+            task["defines"], generator=task["generator"],
+        )
+    except Exception as exc:
+        # Anything a task raises fails that task only; the thread goes on with the next one.
+        LOG.exception("Render task %s (%s) failed", task["id"], task.get("generator"))
+        queue.fail(task["id"], f"{type(exc).__name__}: {exc}")
+        return
+    LOG.info("Render task %s (%s) done in %.1fs", task["id"], task["generator"], profile["wall_seconds"])
+    queue.complete(task["id"], profile)
+
+
+def heartbeat(queue: SqliteRenderQueue, runner: OpenScad, name: str, reported: dict, stop: threading.Event) -> None:
+    """Report this worker's OpenSCAD version to the queue until ``stop`` is set."""
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            reported["version"] = runner.version()
+            queue.heartbeat(name, reported["version"])
+        except Exception:
+            LOG.exception("Render queue heartbeat failed")
+
+
+def work(queue: SqliteRenderQueue, worker: str, runner: OpenScad, reported: dict, lease: float, poll: float,
+         stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            task = queue.claim(worker, lease, reported["version"])
+            if task is not None:
+                render_task(queue, runner, task)
+        except Exception:
+            # Usually the queue file being unavailable (including reporting a result);
+            # the lease hands an unreported task to a worker again.
+            LOG.exception("Render queue unavailable")
+            task = None
+        if task is None:
+            stop.wait(poll)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1, help="parallel renders (default: CPU count)")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between checks of an empty queue (default: 1)")
+    parser.add_argument("--lease", type=float, default=900, help="seconds before an unfinished task is handed out again (default: 900)")
+    parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}", help="worker name stored with claimed tasks")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    if not RENDER_QUEUE_PATH:
+        raise SystemExit("GRIDFINITY_RENDER_QUEUE is not set")
+    runner = OpenScad(OPENSCAD, ROOT, logger=LOG)
+    if not runner.available():
+        raise SystemExit(f"OpenSCAD not found: {OPENSCAD}")
+    queue = SqliteRenderQueue(Path(RENDER_QUEUE_PATH))
+    # Tasks carry the OpenSCAD version their cache key was made with; this worker only takes its own.
+    reported = {"version": runner.version()}
+    if not reported["version"]:
+        raise SystemExit(f"OpenSCAD does not run: {OPENSCAD}")
+    queue.heartbeat(args.name, reported["version"])
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    threads = [
+        threading.Thread(
+            target=work, args=(queue, f"{args.name}/{index}", runner, reported, args.lease, args.poll, stop),
+            name=f"render-{index}",
+        )
+        for index in range(max(1, args.concurrency))
+    ]
+    threading.Thread(
+        target=heartbeat, args=(queue, runner, args.name, reported, stop), name="heartbeat", daemon=True,
+    ).start()
+    for thread in threads:
+        thread.start()
+    LOG.info("%s: %d render threads on %s for %s", args.name, len(threads), queue.path, reported["version"])
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
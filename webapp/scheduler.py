@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class RenderScheduler:
+    """Single-flight render gate keyed by cache key.
+
+    Callers asking for a key that is already being rendered wait for that render
+    instead of starting their own. Distinct keys run in parallel, at most ``limit``
+    at a time. ``on_wait(reason, seconds)`` is told how long each caller waited,
+    either for another caller's render ("shared") or for a free slot ("slot").
+    """
+
+    def __init__(self, limit: int, on_wait: Callable[[str, float], None] | None = None):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._running = 0
+        self._on_wait = on_wait
+
+    def _waited(self, reason: str, started: float) -> None:
+        if self._on_wait is not None:
+            self._on_wait(reason, time.monotonic() - started)
+
+    def run(self, key: str, render: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = Future()
+        started = time.monotonic()
+        if not owner:
+            try:
+                return flight.result()
+            finally:
+                self._waited("shared", started)
+
+        try:
+            with self._slots:
+                self._waited("slot", started)
+                with self._lock:
+                    self._running += 1
+                try:
+                    result = render()
+                finally:
+                    with self._lock:
+                        self._running -= 1
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def running(self) -> int:
+        """Renders holding a slot; ``in_flight() - running()`` are queued for one."""
+        with self._lock:
+            return self._running
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+PREFIXES = ("bin-", "pin-", "lid-", "bundle-")
+# The file that makes an entry exist; everything else named <key>.* belongs to it.
+PRIMARY_SUFFIXES = (".stl", ".zip")
+PIECE_PREFIX = "piece"
+PARTIAL_MARKER = ".partial"
+# Abandoned partial renders (e.g. a killed worker) are removed after this long.
+PARTIAL_MAX_AGE = 3600
+
+
+def entry_prefix(key: str) -> str:
+    for prefix in PREFIXES:
+        if key.startswith(prefix):
+            return prefix
+    return PIECE_PREFIX
+
+
+class StlCache:
+    """Byte-bounded cache of rendered files with LRU eviction by last hit time.
+
+    An entry is every file named ``<key>.*`` in ``directory``: the STL (or bundle
+    ZIP) plus any generated SCAD, compressed copy or sidecar files. Sizes, hit counts and last-hit times live in
+    a SQLite index next to the files, so they survive restarts and are shared by
+    every process using the same directory.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.directory / "index.sqlite3"
+        self._gc_lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, prefix TEXT NOT NULL, bytes INTEGER NOT NULL,"
+                " created REAL NOT NULL, last_hit REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_last_hit ON entries (last_hit)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self._index_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def path(self, key: str, suffix: str = ".stl") -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _files(self, key: str) -> list[Path]:
+        return [path for path in self.directory.glob(f"{key}.*") if PARTIAL_MARKER not in path.name]
+
+    def read_meta(self, key: str) -> dict:
+        """Return the JSON sidecar of ``key`` (empty if it has none yet)."""
+        try:
+            return json.loads(self.path(key, ".json").read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_meta(self, key: str, **sections) -> dict:
+        """Merge ``sections`` into the JSON sidecar of ``key``."""
+        meta = self.read_meta(key)
+        meta.update(sections)
+        partial = self.path(key, f".json.{os.getpid()}{PARTIAL_MARKER}")
+        partial.write_text(json.dumps(meta, sort_keys=True), encoding="utf-8")
+        os.replace(partial, self.path(key, ".json"))
+        return meta
+
+    def profiles(self):
+        """Yield ``(key, profile)`` for every entry whose sidecar holds a render profile."""
+        for path in self.directory.glob("*.json"):
+            if PARTIAL_MARKER in path.name:
+                continue
+            profile = self.read_meta(path.stem).get("profile")
+            if profile:
+                yield path.stem, profile
+
+    def hit(self, key: str) -> bool:
+        """Record a lookup of ``key`` and return whether its STL or ZIP is present."""
+        if not any(self.path(key, suffix).exists() for suffix in PRIMARY_SUFFIXES):
+            return False
+        now = time.time()
+        with self._connect() as db:
+            updated = db.execute(
+                "UPDATE entries SET hits = hits + 1, last_hit = ? WHERE key = ?", (now, key)
+            ).rowcount
+        if not updated:
+            self.add(key, hits=1)
+        return True
+
+    def add(self, key: str, *, hits: int = 0) -> None:
+        """Index (or re-measure) the files of ``key`` and evict if over quota."""
+        size = sum(path.stat().st_size for path in self._files(key))
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO entries (key, prefix, bytes, created, last_hit, hits) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET bytes = excluded.bytes, last_hit = excluded.last_hit",
+                (key, entry_prefix(key), size, now, now, hits),
+            )
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def total_bytes(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    def _remove(self, db: sqlite3.Connection, key: str) -> int:
+        removed = 0
+        for path in self._files(key):
+            try:
+                removed += path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return removed
+
+    def evict(self) -> int:
+        """Drop least recently hit entries until the cache fits its quota."""
+        removed = 0
+        with self._gc_lock, self._connect() as db:
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+            rows = db.execute("SELECT key, bytes FROM entries ORDER BY last_hit").fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                removed += self._remove(db, key)
+                total -= size
+        return removed
+
+    def purge(self, prefix: str | None = None) -> dict:
+        """Remove every entry, or only those of one prefix (``bin-``, ``pin-``, ``lid-``, ``piece``)."""
+        with self._gc_lock, self._connect() as db:
+            if prefix is None:
+                keys = [row[0] for row in db.execute("SELECT key FROM entries")]
+            else:
+                keys = [row[0] for row in db.execute("SELECT key FROM entries WHERE prefix = ?", (prefix,))]
+            removed = sum(self._remove(db, key) for key in keys)
+        return {"entries": len(keys), "bytes": removed}
+
+    def collect(self) -> dict:
+        """Reconcile the index with the directory, drop stale partial files and enforce the quota."""
+        now = time.time()
+        on_disk: set[str] = set()
+        stale = 0
+        for path in self.directory.iterdir():
+            if path == self._index_path or path.name.startswith(self._index_path.name):
+                continue
+            if PARTIAL_MARKER in path.name:
+                try:
+                    if now - path.stat().st_mtime > PARTIAL_MAX_AGE:
+                        path.unlink()
+                        stale += 1
+                except FileNotFoundError:
+                    pass
+                continue
+            if path.suffix in PRIMARY_SUFFIXES:
+                on_disk.add(path.stem)
+        with self._gc_lock, self._connect() as db:
+            indexed = {row[0] for row in db.execute("SELECT key FROM entries")}
+            # The directory was listed before the index was read, so an entry written in
+            # between is indexed but not listed; only drop entries whose file is really gone.
+            missing = [
+                key for key in indexed - on_disk
+                if not any(self.path(key, suffix).exists() for suffix in PRIMARY_SUFFIXES)
+            ]
+            for key in missing:
+                self._remove(db, key)
+            for key in on_disk - indexed:
+                try:
+                    stats = [path.stat() for path in self._files(key)]
+                except FileNotFoundError:
+                    continue
+                if not stats:
+                    continue
+                size = sum(item.st_size for item in stats)
+                last_hit = max(item.st_mtime for item in stats)
+                db.execute(
+                    "INSERT OR IGNORE INTO entries (key, prefix, bytes, created, last_hit, hits)"
+                    " VALUES (?, ?, ?, ?, ?, 0)",
+                    (key, entry_prefix(key), size, last_hit, last_hit),
+                )
+        evicted = self.evict()
+        return {
+            "dropped": len(missing), "adopted": len(on_disk - indexed),
+            "stale_partials": stale, "evicted_bytes": evicted,
+        }
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT prefix, COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(hits), 0)"
+                " FROM entries GROUP BY prefix"
+            ).fetchall()
+        prefixes = {prefix: {"entries": 0, "bytes": 0, "hits": 0} for prefix in (*PREFIXES, PIECE_PREFIX)}
+        for prefix, entries, size, hits in rows:
+            prefixes[prefix] = {"entries": entries, "bytes": size, "hits": hits}
+        return {
+            "directory": str(self.directory),
+            "max_bytes": self.max_bytes,
+            "bytes": sum(item["bytes"] for item in prefixes.values()),
+            "entries": sum(item["entries"] for item in prefixes.values()),
+            "prefixes": prefixes,
+        }
+
+    def start_gc(self, interval: float, log_error) -> threading.Thread:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.collect()
+                except Exception:
+                    log_error("STL cache garbage collection failed")
+
+        thread = threading.Thread(target=loop, name="stl-cache-gc", daemon=True)
+        thread.start()
+        return thread
+
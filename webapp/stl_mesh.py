@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+
+BINARY_HEADER_SIZE = 80
+BINARY_RECORD = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute", "<u2"),
+])
+
+
+def is_binary_stl(data: bytes) -> bool:
+    if len(data) < BINARY_HEADER_SIZE + 4:
+        return False
+    count = int.from_bytes(data[BINARY_HEADER_SIZE:BINARY_HEADER_SIZE + 4], "little")
+    # ASCII files may also start with "solid", so the size check is the reliable test.
+    return len(data) == BINARY_HEADER_SIZE + 4 + count * BINARY_RECORD.itemsize
+
+
+def read_stl(path: Path) -> np.ndarray:
+    """Return the triangles of an ASCII or binary STL as a ``(n, 3, 3)`` float64 array."""
+    data = Path(path).read_bytes()
+    if is_binary_stl(data):
+        records = np.frombuffer(data, BINARY_RECORD, offset=BINARY_HEADER_SIZE + 4)
+        return records["vertices"].astype(np.float64)
+    values = [
+        line.split()[1:4]
+        for line in data.decode("ascii", errors="replace").splitlines()
+        if line.lstrip().startswith("vertex")
+    ]
+    return np.asarray(values, dtype=np.float64).reshape(-1, 3, 3)
+
+
+def face_normals(triangles: np.ndarray) -> np.ndarray:
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def write_stl(path: Path, triangles: np.ndarray, binary: bool = True) -> None:
+    """Write triangles as a binary STL, or as ASCII in the same layout OpenSCAD produces."""
+    normals = face_normals(triangles)
+    if binary:
+        records = np.zeros(len(triangles), BINARY_RECORD)
+        records["normal"] = normals
+        records["vertices"] = triangles
+        with Path(path).open("wb") as stream:
+            stream.write(b"OpenSCAD Model".ljust(BINARY_HEADER_SIZE, b"\0"))
+            stream.write(len(triangles).to_bytes(4, "little"))
+            stream.write(records.tobytes())
+        return
+    rows = np.concatenate([normals[:, None, :], triangles], axis=1).reshape(-1, 12)
+    facet = (
+        "  facet normal {:g} {:g} {:g}\n    outer loop\n"
+        "      vertex {:g} {:g} {:g}\n      vertex {:g} {:g} {:g}\n      vertex {:g} {:g} {:g}\n"
+        "    endloop\n  endfacet\n"
+    )
+    with Path(path).open("w", encoding="ascii") as stream:
+        stream.write("solid OpenSCAD_Model\n")
+        stream.writelines(facet.format(*row) for row in rows.tolist())
+        stream.write("endsolid OpenSCAD_Model\n")
+
+
+def split_by_x(triangles: np.ndarray, edges) -> list[np.ndarray]:
+    """Group triangles into the slabs between consecutive x ``edges`` by their centroid.
+
+    Triangles outside ``edges[0]..edges[-1]`` are dropped.
+    """
+    slab = np.searchsorted(np.asarray(edges, dtype=np.float64), triangles[:, :, 0].mean(axis=1)) - 1
+    return [triangles[slab == index] for index in range(len(edges) - 1)]
+
+
+def _roll_rows(triangles: np.ndarray, distances: np.ndarray, first: np.ndarray):
+    """Cyclically rotate each triangle so vertex ``first`` comes first (keeps the winding)."""
+    order = (first[:, None] + np.arange(3)) % 3
+    return np.take_along_axis(triangles, order[:, :, None], axis=1), np.take_along_axis(distances, order, axis=1)
+
+
+def _crossing(a, da, b, db, axis: int, value: float) -> np.ndarray:
+    # Always interpolate from the negative end, so both triangles sharing an edge
+    # get bit-identical points and the cut stays watertight.
+    swap = da > 0
+    a, b = np.where(swap[:, None], b, a), np.where(swap[:, None], a, b)
+    da, db = np.where(swap, db, da), np.where(swap, da, db)
+    points = a + (b - a) * (da / (da - db))[:, None]
+    points[:, axis] = value
+    return points
+
+
+def clip_axis(triangles: np.ndarray, axis: int, value: float, tolerance: float = 1e-6) -> np.ndarray:
+    """Split every triangle that crosses the plane ``coordinate[axis] == value``.
+
+    Afterwards no triangle has vertices strictly on both sides of the plane, so the
+    mesh can be cut there by sorting triangles on their centroid.
+    """
+    distances = triangles[:, :, axis] - value
+    distances[np.abs(distances) < tolerance] = 0
+    crossing = (distances > 0).any(axis=1) & (distances < 0).any(axis=1)
+    parts = [triangles[~crossing]]
+    crossed, distances = triangles[crossing], distances[crossing]
+    on_plane = (distances == 0).sum(axis=1)
+
+    touching = on_plane == 1
+    if touching.any():
+        # One vertex on the plane: cut the opposite edge.
+        t, d = _roll_rows(crossed[touching], distances[touching], np.argmax(distances[touching] == 0, axis=1))
+        middle = _crossing(t[:, 1], d[:, 1], t[:, 2], d[:, 2], axis, value)
+        parts.append(np.stack([t[:, 0], t[:, 1], middle], axis=1))
+        parts.append(np.stack([t[:, 0], middle, t[:, 2]], axis=1))
+
+    straddling = on_plane == 0
+    if straddling.any():
+        # One vertex alone on its side: a tip triangle plus the remaining quad as two.
+        signs = np.sign(distances[straddling])
+        lone = np.argmax(signs == -signs.sum(axis=1, keepdims=True), axis=1)
+        t, d = _roll_rows(crossed[straddling], distances[straddling], lone)
+        first = _crossing(t[:, 0], d[:, 0], t[:, 1], d[:, 1], axis, value)
+        second = _crossing(t[:, 0], d[:, 0], t[:, 2], d[:, 2], axis, value)
+        parts.append(np.stack([t[:, 0], first, second], axis=1))
+        parts.append(np.stack([first, t[:, 1], t[:, 2]], axis=1))
+        parts.append(np.stack([first, t[:, 2], second], axis=1))
+    return np.concatenate(parts)
+
+
+def _inside_segment(points: np.ndarray, a: np.ndarray, b: np.ndarray, tolerance: float) -> np.ndarray:
+    """``points`` lying on segment ``a``-``b`` but further than ``tolerance`` from both ends, ordered from ``a``."""
+    direction = b - a
+    length = float(np.linalg.norm(direction))
+    if length <= 2 * tolerance:
+        return points[:0]
+    along = (points - a) @ direction / length
+    off = np.linalg.norm(points - a - along[:, None] * direction / length, axis=1)
+    inside = (along > tolerance) & (along < length - tolerance) & (off < tolerance)
+    return points[inside][np.argsort(along[inside])]
+
+
+def _has_inside_points(a: np.ndarray, b: np.ndarray, points: np.ndarray, tolerance: float,
+                       chunk: int = 512) -> np.ndarray:
+    """Whether each segment ``a``-``b`` has one of ``points`` strictly inside it (see ``_inside_segment``)."""
+    direction = b - a
+    length = np.linalg.norm(direction, axis=1)
+    unit = np.divide(direction, length[:, None], out=np.zeros_like(direction), where=length[:, None] > 0)
+    result = np.zeros(len(a), dtype=bool)
+    for start in range(0, len(a), chunk):
+        rows = slice(start, start + chunk)
+        offsets = points[None, :, :] - a[rows, None, :]
+        along = np.einsum("epk,ek->ep", offsets, unit[rows])
+        off = np.einsum("epk,epk->ep", offsets, offsets) - along ** 2
+        inside = (along > tolerance) & (along < length[rows, None] - tolerance) & (off < tolerance ** 2)
+        result[rows] = inside.any(axis=1)
+    return result
+
+
+def close_seam(triangles: np.ndarray, axis: int, value: float, tolerance: float = 1e-4) -> np.ndarray:
+    """Remove T-junctions on the plane ``coordinate[axis] == value``.
+
+    Meshes joined along a plane only share the vertices both sides happened to
+    have there. Every edge lying in the plane is split at the vertices of the
+    other side that fall inside it, so each seam edge ends up shared by exactly
+    two triangles again. No new vertex positions are created.
+    """
+    on_plane = np.abs(triangles[:, :, axis] - value) < tolerance
+    if not (on_plane.sum(axis=1) >= 2).any():
+        return triangles
+    points = np.unique(triangles[on_plane], axis=0)
+    # Most seam edges already match the other side; only triangles with a split edge go through the loop.
+    split = np.zeros(len(triangles), dtype=bool)
+    for index in range(3):
+        edge = on_plane[:, index] & on_plane[:, (index + 1) % 3]
+        split[edge] |= _has_inside_points(triangles[edge, index], triangles[edge, (index + 1) % 3], points, tolerance)
+    stack = list(triangles[split])
+    done = []
+    while stack:
+        triangle = stack.pop()
+        for index in range(3):
+            a, b, c = triangle[index], triangle[(index + 1) % 3], triangle[(index + 2) % 3]
+            inside = _inside_segment(points, a, b, tolerance)
+            if len(inside):
+                # Fan from the opposite vertex; the pieces keep the winding of the triangle.
+                chain = [a, *inside, b]
+                stack.extend(np.stack([start, end, c]) for start, end in zip(chain, chain[1:]))
+                break
+        else:
+            done.append(triangle)
+    return np.concatenate([triangles[~split], np.asarray(done).reshape(-1, 3, 3)])
+
+
+def weld(triangles: np.ndarray, decimals: int = 4) -> np.ndarray:
+    """Snap vertices that coincide after rounding to one position and drop collapsed triangles."""
+    vertices = triangles.reshape(-1, 3)
+    _, first, inverse = np.unique(np.round(vertices, decimals), axis=0, return_index=True, return_inverse=True)
+    welded = vertices[first][inverse.reshape(-1)].reshape(-1, 3, 3)
+    indices = inverse.reshape(-1, 3)
+    keep = (indices[:, 0] != indices[:, 1]) & (indices[:, 1] != indices[:, 2]) & (indices[:, 0] != indices[:, 2])
+    return welded[keep]
+
+
+def tile_cells(template: np.ndarray, template_cells: tuple[int, int], cells: tuple[int, int], pitch: float) -> np.ndarray:
+    """Build a centred ``cells`` grid mesh from a centred ``template_cells`` grid mesh.
+
+    The template must be at most three cells along each axis: its first and last
+    cells supply the outer rows and columns of the result (rounded corners, edge
+    features) and its middle cell everything in between. The copies are stitched
+    along the cell boundaries, so the result is closed if the template is.
+    """
+    extents = [count * pitch / 2 for count in template_cells]
+    for axis, count in enumerate(template_cells):
+        for boundary in range(1, count):
+            template = clip_axis(template, axis, boundary * pitch - extents[axis])
+    centroids = template.mean(axis=1)
+    columns = [
+        np.clip(np.floor((centroids[:, axis] + extents[axis]) / pitch), 0, count - 1).astype(int)
+        for axis, count in enumerate(template_cells)
+    ]
+
+    def source(index: int, count: int, template_count: int) -> int:
+        return 0 if index == 0 else template_count - 1 if index == count - 1 else 1
+
+    pieces = []
+    for x in range(cells[0]):
+        sx = source(x, cells[0], template_cells[0])
+        for y in range(cells[1]):
+            sy = source(y, cells[1], template_cells[1])
+            shift = ((x - sx) * pitch + extents[0] - cells[0] * pitch / 2,
+                     (y - sy) * pitch + extents[1] - cells[1] * pitch / 2, 0.0)
+            pieces.append(template[(columns[0] == sx) & (columns[1] == sy)] + shift)
+    result = weld(np.concatenate(pieces))
+    for axis, count in enumerate(cells):
+        for boundary in range(1, count):
+            result = close_seam(result, axis, boundary * pitch - count * pitch / 2)
+    return result
+
+
+def transform_xy(triangles: np.ndarray, matrix: tuple[tuple[int, int], tuple[int, int]]) -> np.ndarray:
+    """Apply a 2x2 matrix to the x/y coordinates around the origin, keeping outward-facing normals."""
+    linear = np.identity(3)
+    linear[:2, :2] = matrix
+    result = triangles @ linear.T
+    if np.linalg.det(linear) < 0:
+        # Reflections flip the winding order, which would turn the mesh inside out.
+        result = result[:, ::-1]
+    return result
@@ -0,0 +1,199 @@
+"""
+Pre-render popular or enumerated configurations into the STL cache.
+
+    python warmup.py log --top 50
+    python warmup.py matrix bin gridx=1-4 gridy=1-4 gridz=2-6
+    python warmup.py matrix lid gridx=1-3 gridy=1-3 lid_style=default,flat
+
+Runs at low CPU priority (OpenSCAD children inherit it), so it can be started
+on a live server right after a deploy or a cache purge.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import app as web
+from action_log import ActionLog
+
+
+# Action log names written by app.record_request_action.
+LOG_ACTIONS = {
+    "生成底板 STL": "piece",
+    "生成并下载底板 ZIP": "plan",
+    "生成盒子 STL": "bin",
+    "生成插销 STL": "pin",
+    "生成防尘盖 STL": "lid",
+}
+# Background jobs (POST /api/jobs, status 202) are logged under one action with the job kind in the details.
+JOB_ACTION = "提交后台生成任务"
+JOB_KINDS = {"bundle": "plan", "bin": "bin", "pin": "pin", "lid": "lid"}
+
+
+def normalize(kind: str, body: dict) -> dict:
+    """Validate request values the way the endpoint would and return canonical parameters."""
+    if kind in ("piece", "plan"):
+        values = web.parse_payload(body)
+        if kind == "piece":
+            values["piece_id"] = int(body.get("piece_id", 1))
+        return values
+    return {"bin": web.parse_bin_payload, "pin": web.parse_pin_payload, "lid": web.parse_lid_payload}[kind](body)
+
+
+def render(kind: str, params: dict) -> int:
+    """Render one configuration into the cache and return how many STLs it covers."""
+    if kind in ("piece", "plan"):
+        pieces = web.plan_for(params)["pieces"]
+        if kind == "piece":
+            if not 1 <= params["piece_id"] <= len(pieces):
+                raise ValueError("请选择有效的底板编号")
+            pieces = [pieces[params["piece_id"] - 1]]
+        for future in web.render_pieces(pieces, params["grid"], params["style"], params["magnets"]):
+            future.result()
+        return len(pieces)
+    {"bin": web.render_bin, "pin": web.render_pin, "lid": web.render_lid}[kind](params)
+    return 1
+
+
+def parse_log_line(line: str) -> tuple[str, dict] | None:
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+        details = entry.get("details") if isinstance(entry.get("details"), dict) else {}
+        if entry.get("action") == JOB_ACTION and entry.get("status") == 202 and details.get("kind") in JOB_KINDS:
+            return JOB_KINDS[details["kind"]], {key: value for key, value in details.items() if key != "kind"}
+        if entry.get("action") not in LOG_ACTIONS or entry.get("status") != 200:
+            return None
+        return LOG_ACTIONS[entry["action"]], details
+    # Pipe separated lines written before the log switched to JSON.
+    parts = line.rstrip("\n").split(" | ")
+    if len(parts) < 3 or parts[2] not in LOG_ACTIONS:
+        return None
+    if not any(part == "状态 200" for part in parts[3:]):
+        return None
+    details = {}
+    if len(parts) > 3 and "=" in parts[-1]:
+        for token in parts[-1].split(" "):
+            key, _, value = token.partition("=")
+            if key:
+                details[key] = value
+    return LOG_ACTIONS[parts[2]], details
+
+
+def log_files(path: Path) -> list[Path]:
+    """Rotated files of the action log, oldest first, followed by the log itself."""
+    return [file for file in [*ActionLog(path, web.ACTION_TIMEZONE).rotated(), path] if file.exists()]
+
+
+def configurations_from_log(path: Path, top: int, kinds: set[str]) -> list[tuple[str, dict, int]]:
+    """Return the ``top`` most requested valid configurations as ``(kind, params, count)``.
+
+    The log only keeps the main request fields, so anything it does not record
+    falls back to the endpoint defaults. Rotated files next to ``path`` are
+    read too.
+    """
+    counts: Counter[str] = Counter()
+    for file in log_files(path):
+        with file.open(encoding="utf-8", errors="replace") as stream:
+            for line in stream:
+                parsed = parse_log_line(line)
+                if parsed is None or parsed[0] not in kinds:
+                    continue
+                kind, body = parsed
+                try:
+                    params = normalize(kind, body)
+                except (ValueError, KeyError):
+                    continue
+                counts[json.dumps([kind, params], sort_keys=True)] += 1
+    return [(*json.loads(key), count) for key, count in counts.most_common(top)]
+
+
+def expand_values(spec: str) -> list[str]:
+    values = []
+    for item in spec.split(","):
+        low, dash, high = item.partition("-")
+        if dash and low.isdigit() and high.isdigit():
+            values.extend(str(value) for value in range(int(low), int(high) + 1))
+        else:
+            values.append(item)
+    return values
+
+
+def configurations_from_matrix(kind: str, assignments: list[str]) -> list[tuple[str, dict, int]]:
+    names, choices = [], []
+    for assignment in assignments:
+        name, equals, spec = assignment.partition("=")
+        if not equals:
+            raise SystemExit(f"expected NAME=VALUES, got {assignment!r}")
+        names.append(name)
+        choices.append(expand_values(spec))
+    configurations, seen = [], set()
+    for combination in itertools.product(*choices):
+        try:
+            params = normalize(kind, dict(zip(names, combination)))
+        except (ValueError, KeyError) as exc:
+            print(f"skip {dict(zip(names, combination))}: {exc}")
+            continue
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configurations.append((kind, params, 0))
+    return configurations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=1, help="parallel renders (default: 1)")
+    parser.add_argument("--nice", type=int, default=19, help="CPU niceness increment (default: 19)")
+    parser.add_argument("--dry-run", action="store_true", help="only list the configurations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    from_log = commands.add_parser("log", help="warm the most requested configurations from the action log")
+    from_log.add_argument("--path", type=Path, default=web.ACTION_LOG_PATH)
+    from_log.add_argument("--top", type=int, default=50)
+    from_log.add_argument("--kinds", default="piece,plan,bin,pin,lid")
+    matrix = commands.add_parser("matrix", help="warm every combination of explicit parameter values")
+    matrix.add_argument("kind", choices=("piece", "plan", "bin", "pin", "lid"))
+    matrix.add_argument("assignments", nargs="+", metavar="NAME=VALUES",
+                        help="comma separated values and/or integer ranges, e.g. gridz=2-6 or cut_mode=compartments,circles")
+    args = parser.parse_args()
+
+    if args.command == "log":
+        configurations = configurations_from_log(args.path, args.top, set(args.kinds.split(",")))
+    else:
+        configurations = configurations_from_matrix(args.kind, args.assignments)
+    if args.dry_run:
+        for kind, params, count in configurations:
+            print(f"{count:6d}  {kind:5s} {json.dumps(params, ensure_ascii=False, sort_keys=True)}")
+        return
+    if not web.renderer_available():
+        # With GRIDFINITY_RENDER_QUEUE set, render workers do the rendering instead.
+        raise SystemExit(f"OpenSCAD not found and no render worker is running: {web.OPENSCAD}")
+    os.nice(args.nice)
+
+    def warm(index: int, kind: str, params: dict) -> None:
+        started = time.monotonic()
+        try:
+            covered = render(kind, params)
+        except (ValueError, RuntimeError, OSError, subprocess.TimeoutExpired) as exc:
+            print(f"[{index}/{len(configurations)}] {kind} failed: {exc}", flush=True)
+        else:
+            print(f"[{index}/{len(configurations)}] {kind} x{covered} {time.monotonic() - started:.1f}s", flush=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for index, (kind, params, _) in enumerate(configurations, 1):
+            pool.submit(warm, index, kind, params)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from compression import CHUNK_SIZE
+
+
+ZIP64_VERSION = 45
+UTF8_FLAG = 0x0800
+DEFLATED = 8
+UINT32_MAX = 0xFFFFFFFF
+UINT16_MAX = 0xFFFF
+
+
+@dataclass
+class ZipEntry:
+    """One archive member whose data is already raw-deflate compressed."""
+
+    name: str
+    crc32: int
+    size: int
+    compressed_size: int
+    chunks: Callable[[], Iterator[bytes]]
+
+
+def bytes_entry(name: str, data: bytes) -> ZipEntry:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    return ZipEntry(name, zlib.crc32(data), len(data), len(compressed), lambda: iter((compressed,)))
+
+
+def precompressed_entry(name: str, deflate_path: Path, meta: dict,
+                        restore: Callable[[], object] | None = None) -> ZipEntry:
+    """Entry spliced from a stored raw deflate file (see ``compression.deflate_file``).
+
+    If the file is gone by the time the entry is written (e.g. evicted from a
+    cache), ``restore`` is asked to write it again, with the same ``meta``.
+    """
+    def chunks() -> Iterator[bytes]:
+        try:
+            stream = Path(deflate_path).open("rb")
+        except OSError:
+            if restore is None:
+                raise
+            restore()
+            stream = Path(deflate_path).open("rb")
+        with stream:
+            while chunk := stream.read(CHUNK_SIZE):
+                yield chunk
+
+    return ZipEntry(name, meta["crc32"], meta["size"], meta["deflate_size"], chunks)
+
+
+def _dos_time(timestamp: float) -> tuple[int, int]:
+    moment = time.localtime(timestamp)
+    dos_time = (moment.tm_hour << 11) | (moment.tm_min << 5) | (moment.tm_sec // 2)
+    dos_date = ((moment.tm_year - 1980) << 9) | (moment.tm_mon << 5) | moment.tm_mday
+    return dos_time, dos_date
+
+
+def stream_zip(entries: Iterable[ZipEntry]) -> Iterator[bytes]:
+    """Yield a ZIP64 archive of precompressed entries without recompressing anything.
+
+    Entries are consumed lazily, so the caller can produce each one only when it is
+    ready; at most one chunk of entry data is held in memory at a time. Sizes and
+    CRCs are known up front, so no data descriptors are needed.
+    """
+    dos_time, dos_date = _dos_time(time.time())
+    offset = 0
+    directory = []
+    for entry in entries:
+        name = entry.name.encode("utf-8")
+        local_extra = struct.pack("<HHQQ", 0x0001, 16, entry.size, entry.compressed_size)
+        header = struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, ZIP64_VERSION, UTF8_FLAG, DEFLATED, dos_time, dos_date,
+            entry.crc32, UINT32_MAX, UINT32_MAX, len(name), len(local_extra),
+        ) + name + local_extra
+        yield header
+        written = 0
+        for chunk in entry.chunks():
+            written += len(chunk)
+            yield chunk
+        if written != entry.compressed_size:
+            raise RuntimeError(f"ZIP entry {entry.name} changed while it was being written")
+        directory.append((entry, name, offset))
+        offset += len(header) + written
+
+    directory_start = offset
+    for entry, name, entry_offset in directory:
+        extra = struct.pack("<HHQQQ", 0x0001, 24, entry.size, entry.compressed_size, entry_offset)
+        record = struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | ZIP64_VERSION, ZIP64_VERSION, UTF8_FLAG,
+            DEFLATED, dos_time, dos_date, entry.crc32, UINT32_MAX, UINT32_MAX, len(name), len(extra),
+            0, 0, 0, 0o100644 << 16, UINT32_MAX,
+        ) + name + extra
+        offset += len(record)
+        yield record
+
+    directory_size = offset - directory_start
+    count = len(directory)
+    yield struct.pack(
+        "<IQHHIIQQQQ", 0x06064B50, 44, (3 << 8) | ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+        count, count, directory_size, directory_start,
+    )
+    yield struct.pack("<IIQI", 0x07064B50, 0, offset, 1)
+    yield struct.pack(
+        "<IHHHHIIH", 0x06054B50, 0, 0, min(count, UINT16_MAX), min(count, UINT16_MAX),
+        min(directory_size, UINT32_MAX), UINT32_MAX, 0,
+    )